@@ -1,12 +1,175 @@
+import asyncio
+import inspect
 import json
+import time
+import uuid
 from collections.abc import Callable
-from typing import Any
+from typing import Any, Protocol
 
-from anthropic import AsyncAnthropic
-from anthropic.types import MessageParam, ToolUnionParam
+import httpx
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+from anthropic.types import Message, MessageParam, ToolUnionParam, ToolUseBlock, Usage
 
-from .config import DEBUG, MAX_TOKENS, DEFAULT_MAX_STEPS, DEFAULT_MODEL, DEFAULT_VERBOSE
-from .tools import reset_namespace
+from .config import (
+	DEBUG, MAX_TOKENS, DEFAULT_MAX_STEPS, DEFAULT_MODEL, DEFAULT_VERBOSE, PROMPT_CACHING, HISTORY_COMPACTION, STREAMING,
+	CONCURRENT_TOOL_CALLS,
+	HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_KEEPALIVE_EXPIRY_SECONDS,
+)
+from .compaction import compact_messages
+from .response_cache import ResponseCache
+from .scheduler import RequestScheduler, estimate_input_tokens
+from .tools import SandboxSession, is_output_limit_error
+from .tracing import RunTracer
+
+
+def create_client(
+	max_connections: int = HTTP_MAX_CONNECTIONS,
+	max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+	keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY_SECONDS,
+) -> AsyncAnthropic:
+	limits = httpx.Limits(
+		max_connections=max_connections,
+		max_keepalive_connections=max_keepalive_connections,
+		keepalive_expiry=keepalive_expiry,
+	)
+	return AsyncAnthropic(max_retries=0, http_client=DefaultAsyncHttpxClient(limits=limits))
+
+
+class ModelBackend(Protocol):
+	async def create_message(self, **request: Any) -> Message: ...
+
+	async def stream_message(
+		self,
+		on_attempt: Callable[[], None],
+		on_first_token: Callable[[], None],
+		on_tool_use: Callable[[ToolUseBlock], None],
+		**request: Any,
+	) -> Message: ...
+
+
+class AnthropicBackend:
+	def __init__(self, client: AsyncAnthropic, scheduler: RequestScheduler | None = None) -> None:
+		self.client = client
+		self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+
+	async def create_message(self, **request: Any) -> Message:
+		return await self.scheduler.create_message(self.client, **request)
+
+	async def stream_message(
+		self,
+		on_attempt: Callable[[], None],
+		on_first_token: Callable[[], None],
+		on_tool_use: Callable[[ToolUseBlock], None],
+		**request: Any,
+	) -> Message:
+		async def consume_stream() -> Message:
+			on_attempt()
+			async with self.client.messages.stream(**request) as stream:
+				async for event in stream:
+					if event.type in ("content_block_start", "content_block_delta"):
+						on_first_token()
+					elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+						on_tool_use(event.content_block)
+				return await stream.get_final_message()
+
+		return await self.scheduler.submit(request, consume_stream)
+
+
+class PromptCacheStats:
+	def __init__(self) -> None:
+		self.hits = 0
+		self.misses = 0
+		self.read_tokens = 0
+		self.creation_tokens = 0
+
+	def record(self, usage: Usage) -> None:
+		read_tokens = usage.cache_read_input_tokens or 0
+		self.read_tokens += read_tokens
+		self.creation_tokens += usage.cache_creation_input_tokens or 0
+		if read_tokens:
+			self.hits += 1
+		else:
+			self.misses += 1
+
+
+def with_cache_breakpoints(tools: list[ToolUnionParam], prompt: str) -> tuple[list[ToolUnionParam], MessageParam]:
+	ephemeral = {"type": "ephemeral"}
+	cached_tools = [*tools[:-1], {**tools[-1], "cache_control": ephemeral}] if tools else tools
+	prompt_message: MessageParam = {"role": "user", "content": [{"type": "text", "text": prompt, "cache_control": ephemeral}]}
+	return cached_tools, prompt_message
+
+
+def policy_expression(policy: str) -> str:
+	return f"from src.environment import DataProcessor\nprint(DataProcessor(df).{policy}())"
+
+
+def scripted_content(messages: list[Any], expression: str) -> list[dict[str, Any]]:
+	tool_results = [
+		block for message in messages if message["role"] == "user" and isinstance(message["content"], list)
+		for block in message["content"] if isinstance(block, dict) and block.get("type") == "tool_result"
+	]
+	if not tool_results:
+		return [{
+			"type": "tool_use",
+			"id": f"toolu_{uuid.uuid4().hex[:24]}",
+			"name": "python_expression",
+			"input": {"expression": expression},
+		}]
+
+	result = json.loads(tool_results[-1]["content"]).get("result")
+	try:
+		answer = float(result)
+	except (TypeError, ValueError):
+		answer = 0.0
+	return [{
+		"type": "tool_use",
+		"id": f"toolu_{uuid.uuid4().hex[:24]}",
+		"name": "submit_answer",
+		"input": {"answer": answer},
+	}]
+
+
+class ScriptedBackend:
+	def __init__(self, policy: str = "calculate_mean_iqr_method", latency: float = 0.0) -> None:
+		self.expression = policy_expression(policy)
+		self.latency = latency
+
+	async def create_message(self, **request: Any) -> Message:
+		if self.latency:
+			await asyncio.sleep(self.latency)
+		return self._message(request)
+
+	async def stream_message(
+		self,
+		on_attempt: Callable[[], None],
+		on_first_token: Callable[[], None],
+		on_tool_use: Callable[[ToolUseBlock], None],
+		**request: Any,
+	) -> Message:
+		on_attempt()
+		# Spend half of the latency before the tool call and half generating after it
+		if self.latency:
+			await asyncio.sleep(self.latency / 2)
+		on_first_token()
+		message = self._message(request)
+		for block in message.content:
+			if block.type == "tool_use":
+				on_tool_use(block)
+		if self.latency:
+			await asyncio.sleep(self.latency / 2)
+		return message
+
+	def _message(self, request: dict[str, Any]) -> Message:
+		return Message.model_validate({
+			"id": f"msg_{uuid.uuid4().hex[:24]}",
+			"type": "message",
+			"role": "assistant",
+			"model": request["model"],
+			"content": scripted_content(request["messages"], self.expression),
+			"stop_reason": "tool_use",
+			"stop_sequence": None,
+			"usage": {"input_tokens": estimate_input_tokens(request), "output_tokens": 20},
+		})
 
 
 async def run_agent_loop(
@@ -16,6 +179,18 @@ async def run_agent_loop(
 	max_steps: int = DEFAULT_MAX_STEPS,
 	model: str = DEFAULT_MODEL,
 	verbose: bool = DEFAULT_VERBOSE,
+	session: SandboxSession | None = None,
+	scheduler: RequestScheduler | None = None,
+	client: AsyncAnthropic | None = None,
+	response_cache: ResponseCache | None = None,
+	backend: ModelBackend | None = None,
+	prompt_caching: bool = PROMPT_CACHING,
+	cache_stats: PromptCacheStats | None = None,
+	history_compaction: bool = HISTORY_COMPACTION,
+	tracer: RunTracer | None = None,
+	streaming: bool = STREAMING,
+	concurrent_tools: bool = CONCURRENT_TOOL_CALLS,
+	max_tokens: int = MAX_TOKENS,
 ) -> Any | None:
 	"""
 	Runs an agent loop with the given prompt and tools.
@@ -27,69 +202,145 @@ async def run_agent_loop(
 		max_steps: Maximum number of steps before stopping (default 5)
 		model: The Anthropic model to use
 		verbose: Whether to print detailed output (default True)
+		session: Sandbox session holding this run's namespace (a fresh one is created if omitted)
+		scheduler: Rate-limit scheduler shared between runs (a private one is created if omitted)
+		client: Long-lived API client shared between runs (a private one is created and closed if omitted)
+		response_cache: Record/replay cache for model responses (calls go straight to the API if omitted)
+		backend: Model backend to query (the Anthropic API through client and scheduler if omitted)
+		prompt_caching: Whether to put prompt-cache breakpoints on the tool list and the task prompt
+		cache_stats: Collects prompt-cache hits and misses for every model call of this run
+		history_compaction: Whether to send a compacted copy of the history (see compact_messages)
+		tracer: Receives model_call and tool_call trace events for this run
+		streaming: Whether to stream responses and start python_expression calls before the response is complete
+		concurrent_tools: Whether to run the tool calls of one response concurrently (results keep their order)
+		max_tokens: Maximum number of tokens per model response
 
 	Returns:
 		The submitted answer if submit_answer was called, otherwise None
 	"""
-	reset_namespace()
-	
-	client = AsyncAnthropic()
-	messages: list[MessageParam] = [{"role": "user", "content": prompt}]
-
-	for step in range(max_steps):
-		steps_remaining = max_steps - step
-		
-		if verbose:
-			print(f"\n{'='*70}")
-			print(f"STEP {step + 1}/{max_steps} - {steps_remaining} steps remaining")
-			print(f"{'='*70}")
-		
-		# Add step count information to the conversation
-		step_info = f"\n\n[SYSTEM INFO] You are on step {step + 1} of {max_steps}. You have {steps_remaining} steps remaining. You can continue working or submit your answer using the submit_answer tool."
-		messages.append({"role": "user", "content": step_info})
-		
-		if DEBUG:
-			print(f"\n>>> Calling model: {model}")
-
-		response = await client.messages.create(
-			model=model, max_tokens=MAX_TOKENS, tools=tools, messages=messages
-		)
-		
-		if DEBUG:
-			print(f"<<< Response stop_reason: {response.stop_reason}")
-
-		assert response.stop_reason in ["max_tokens", "tool_use", "end_turn"], (
-			f"unsupported stop_reason {response.stop_reason}"
-		)
-		if response.stop_reason == "max_tokens":
-			print(
-				f"Model reached max_tokens limit {MAX_TOKENS}. Increase "
-				"MAX_TOKENS, simplify your task, or update the code to provide "
-				"a message back to the model when it exceeds MAX_TOKENS."
+	if backend is None and client is None:
+		async with create_client() as client:
+			return await run_agent_loop(
+				prompt, tools, tool_handlers, max_steps, model, verbose, session, scheduler, client, response_cache,
+				backend, prompt_caching, cache_stats, history_compaction, tracer, streaming,
+				concurrent_tools, max_tokens,
 			)
+	if backend is None:
+		backend = AnthropicBackend(client, scheduler)
+	if session is None:
+		session = SandboxSession()
+	if response_cache is None:
+		response_cache = ResponseCache("passthrough")
 
-		# Track if we need to continue
-		has_tool_use = False
-		tool_results = []
-		submitted_answer = None
-
-		# Process the response
-		for content in response.content:
-			if content.type == "text":
-				if verbose or DEBUG:
-					print(f"\n[Assistant]: {content.text}")
-			elif content.type == "tool_use":
-				has_tool_use = True
-				tool_name = content.name
+	if prompt_caching:
+		tools, prompt_message = with_cache_breakpoints(tools, prompt)
+	else:
+		prompt_message = {"role": "user", "content": prompt}
+	messages: list[MessageParam] = [prompt_message]
+
+	abandoned_tools: list[asyncio.Task] = []
+	try:
+		for step in range(max_steps):
+			steps_remaining = max_steps - step
+			
+			if verbose:
+				print(f"\n{'='*70}")
+				print(f"STEP {step + 1}/{max_steps} - {steps_remaining} steps remaining")
+				print(f"{'='*70}")
+			
+			# Add step count information to the conversation
+			step_info = f"\n\n[SYSTEM INFO] You are on step {step + 1} of {max_steps}. You have {steps_remaining} steps remaining. You can continue working or submit your answer using the submit_answer tool."
+			if history_compaction:
+				request_messages = compact_messages(messages, step_info)
+			else:
+				messages.append({"role": "user", "content": step_info})
+				request_messages = messages
+			
+			if DEBUG:
+				print(f"\n>>> Calling model: {model}")
+
+			request = {"model": model, "max_tokens": max_tokens, "tools": tools, "messages": request_messages}
+			call_start = time.perf_counter()
+			attempt_start = call_start
+			first_token_time = None
+			pending_tools: dict[str, tuple[asyncio.Task, float]] = {}
+
+			def abandon_pending_tools() -> None:
+				# Cancelling a running expression restarts the sandbox and loses the run's variables, so it finishes unseen instead
+				abandoned_tools.extend(task for task, _ in pending_tools.values())
+				pending_tools.clear()
+
+			def start_attempt() -> None:
+				# A retried stream produces new tool_use blocks, so results of calls started by the failed attempt are dropped
+				nonlocal attempt_start, first_token_time
+				attempt_start = time.perf_counter()
+				first_token_time = None
+				abandon_pending_tools()
+
+			def mark_first_token() -> None:
+				nonlocal first_token_time
+				if first_token_time is None:
+					first_token_time = time.perf_counter()
+
+			def dispatch_tool_use(block: ToolUseBlock) -> None:
+				# Only python_expression is started early; other tools run once the response is complete
+				if block.name == "python_expression" and block.name in tool_handlers and isinstance(block.input, dict) and "expression" in block.input:
+					task = asyncio.create_task(tool_handlers[block.name](block.input["expression"], session))
+					pending_tools[block.id] = (task, time.perf_counter())
+
+			try:
+				if streaming:
+					create_response = lambda: backend.stream_message(start_attempt, mark_first_token, dispatch_tool_use, **request)
+				else:
+					create_response = lambda: backend.create_message(**request)
+				response = await response_cache.get_or_create(request, create_response)
+				for tool_use_id in pending_tools.keys() - {block.id for block in response.content if block.type == "tool_use"}:
+					abandoned_tools.append(pending_tools.pop(tool_use_id)[0])
+				time_to_first_token = first_token_time - attempt_start if first_token_time is not None else None
+				
+				if tracer is not None:
+					tracer.emit(
+						"model_call",
+						step=step + 1,
+						duration=time.perf_counter() - call_start,
+						time_to_first_token=time_to_first_token,
+						stop_reason=response.stop_reason,
+						input_tokens=response.usage.input_tokens,
+						output_tokens=response.usage.output_tokens,
+						cache_read_input_tokens=response.usage.cache_read_input_tokens,
+						cache_creation_input_tokens=response.usage.cache_creation_input_tokens,
+					)
+				if cache_stats is not None:
+					cache_stats.record(response.usage)
 				
-				if verbose or DEBUG:
-					print(f"\n[Tool Call]: {tool_name}")
+				if DEBUG:
+					print(f"<<< Response stop_reason: {response.stop_reason}")
+					if time_to_first_token is not None:
+						print(f"<<< Time to first token: {time_to_first_token * 1000:.0f}ms")
 
-				if tool_name in tool_handlers:
+				assert response.stop_reason in ["max_tokens", "tool_use", "end_turn"], (
+					f"unsupported stop_reason {response.stop_reason}"
+				)
+				if response.stop_reason == "max_tokens":
+					print(
+						f"Model reached max_tokens limit {max_tokens}. Increase "
+						"MAX_TOKENS, simplify your task, or update the code to provide "
+						"a message back to the model when it exceeds MAX_TOKENS."
+					)
+
+				async def call_tool(content: ToolUseBlock) -> tuple[dict[str, Any] | None, Any]:
+					tool_name = content.name
+					
+					if verbose or DEBUG:
+						print(f"\n[Tool Call]: {tool_name}")
+
+					if tool_name not in tool_handlers:
+						return None, None
 
 					# Extract arguments based on tool
 					handler = tool_handlers[tool_name]
 					tool_input = content.input
+					submitted_answer = None
 
 					# Call the appropriate tool handler
 					if tool_name == "python_expression":
@@ -100,7 +351,25 @@ async def run_agent_loop(
 							print("\n[Code]:")
 							for line in tool_input["expression"].split("\n"):
 								print(f"  {line}")
-						result = handler(tool_input["expression"])
+						if content.id in pending_tools:
+							task, tool_start = pending_tools.pop(content.id)
+							result = await task
+						else:
+							tool_start = time.perf_counter()
+							result = await handler(tool_input["expression"], session)
+						profile = result.pop("profile", None)
+						if tracer is not None:
+							tracer.emit(
+								"tool_call",
+								step=step + 1,
+								tool=tool_name,
+								duration=time.perf_counter() - tool_start,
+								expression_chars=len(tool_input["expression"]),
+								output_chars=len(result["result"] or ""),
+								error=result["error"] is not None,
+								guard_rejected=is_output_limit_error(result),
+								**({"expression": tool_input["expression"], "profile": profile} if profile is not None else {}),
+							)
 						if verbose or DEBUG:
 							print(f"\n[Result]: {result}")
 					elif tool_name == "submit_answer":
@@ -110,48 +379,83 @@ async def run_agent_loop(
 						result = handler(tool_input["answer"])
 						submitted_answer = result["answer"]
 					else:
-						# Generic handler call
+						# Generic handler call, moved to a thread when calls run concurrently
 						if verbose or DEBUG:
 							print(f"\n[Tool Input]: {tool_input}")
-						result = (
-							handler(**tool_input)
-							if isinstance(tool_input, dict)
-							else handler(tool_input)
-						)
+						args, kwargs = ((), tool_input) if isinstance(tool_input, dict) else ((tool_input,), {})
+						if concurrent_tools and not inspect.iscoroutinefunction(handler):
+							result = await asyncio.to_thread(handler, *args, **kwargs)
+						else:
+							result = handler(*args, **kwargs)
+						if inspect.isawaitable(result):
+							result = await result
 						if verbose or DEBUG:
 							print(f"\n[Tool Result]: {result}")
 
-					tool_results.append(
-						{
-							"type": "tool_result",
-							"tool_use_id": content.id,
-							"content": json.dumps(result),
-						}
-					)
+					return {
+						"type": "tool_result",
+						"tool_use_id": content.id,
+						"content": json.dumps(result),
+					}, submitted_answer
 
-		# If we have tool uses, add them to the conversation
-		if has_tool_use:
-			messages.append({"role": "assistant", "content": response.content})
-			messages.append({"role": "user", "content": tool_results})
-
-			# If an answer was submitted, return it
-			if submitted_answer is not None:
-				if verbose or DEBUG:
-					print(f"\n{'='*70}")
-					print(f"FINAL ANSWER: {submitted_answer}")
-					print(f"{'='*70}\n")
-				return submitted_answer
-		else:
-			# No tool use, conversation might be complete
-			if verbose or DEBUG:
-				print(f"\n{'='*70}")
-				print("No tool use in response, ending loop.")
-				print(f"{'='*70}\n")
-			break
-
-	if verbose or DEBUG:
-		print(f"\n{'='*70}")
-		print(f"Reached maximum steps ({max_steps}) without submitting answer.")
-		print(f"{'='*70}\n")
-	return None
+				# Track if we need to continue
+				has_tool_use = False
+				tool_calls = []
+				submitted_answer = None
+
+				# Process the response
+				for content in response.content:
+					if content.type == "text":
+						if verbose or DEBUG:
+							print(f"\n[Assistant]: {content.text}")
+					elif content.type == "tool_use":
+						has_tool_use = True
+						tool_calls.append(call_tool(content))
+
+				# Independent calls overlap; python_expression calls still queue on the session lock
+				if concurrent_tools:
+					outcomes = await asyncio.gather(*tool_calls)
+				else:
+					outcomes = [await tool_call for tool_call in tool_calls]
+
+				tool_results = []
+				for tool_result, answer in outcomes:
+					if tool_result is not None:
+						tool_results.append(tool_result)
+					if answer is not None:
+						submitted_answer = answer
+
+				# If we have tool uses, add them to the conversation
+				if has_tool_use:
+					messages.append({"role": "assistant", "content": response.content})
+					messages.append({"role": "user", "content": tool_results})
+
+					# If an answer was submitted, return it
+					if submitted_answer is not None:
+						if verbose or DEBUG:
+							print(f"\n{'='*70}")
+							print(f"FINAL ANSWER: {submitted_answer}")
+							print(f"{'='*70}\n")
+						return submitted_answer
+				else:
+					# No tool use, conversation might be complete
+					if verbose or DEBUG:
+						print(f"\n{'='*70}")
+						print("No tool use in response, ending loop.")
+						print(f"{'='*70}\n")
+					break
+
+			finally:
+				abandon_pending_tools()
+
+		if verbose or DEBUG:
+			print(f"\n{'='*70}")
+			print(f"Reached maximum steps ({max_steps}) without submitting answer.")
+			print(f"{'='*70}\n")
+		return None
+	finally:
+		# Only calls still running when the run ends are cancelled, once their results can no longer matter
+		for task in abandoned_tools:
+			task.cancel()
+		await asyncio.gather(*abandoned_tools, return_exceptions=True)
 
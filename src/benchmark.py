@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import inspect
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Callable, Iterator
+from functools import partial
+from typing import Any
+
+import pandas as pd
+
+from .agent import ScriptedBackend, run_agent_loop
+from .calibration import METHOD_NAMES
+from .config import (
+	BENCHMARK_NUM_ROWS, BENCHMARK_REPEATS, BENCHMARK_MIN_SAMPLE_SECONDS, BENCHMARK_REGRESSION_THRESHOLD, BENCHMARK_DIR,
+	TEST_MAX_STEPS, create_prompt,
+)
+from .environment import DataGenerator, DataProcessor, FusedDataProcessor, get_environment
+from .sandbox import ProcessSandboxSession
+from .test_runner import TOOLS
+from .tools import SandboxSession, count_df_values_in_output, is_allowed_summary_output, python_expression_tool, submit_answer_tool
+
+Benchmark = tuple[str, Callable[[], Any]]
+
+EXPRESSIONS = {
+	"shape": "print(df.shape)",
+	"describe": "print(df.describe())",
+}
+
+
+def representative_outputs(df: pd.DataFrame) -> dict[str, str]:
+	info = io.StringIO()
+	df.info(buf=info)
+	return {
+		"head": df.head().to_string(),
+		"describe": df.describe().to_string(),
+		"info": info.getvalue(),
+		"full_frame": df.to_string(),
+	}
+
+
+def data_benchmarks(num_rows: tuple[int, ...]) -> Iterator[Benchmark]:
+	for rows in num_rows:
+		for vectorized in (False, True):
+			generator = partial(DataGenerator, num_rows=rows, vectorized=vectorized)
+			yield f"generate[rows={rows},vectorized={vectorized}]", lambda generator=generator: generator().generate_corrupted_dataset()
+
+		df = DataGenerator(num_rows=rows, vectorized=True).generate_corrupted_dataset()
+		processor = DataProcessor(df)
+		for method in METHOD_NAMES:
+			yield f"process.{method}[rows={rows}]", getattr(processor, f"calculate_mean_{method}_method")
+		yield f"process.fused[rows={rows}]", lambda df=df: FusedDataProcessor(df.to_numpy()).calculate_means()
+
+
+def output_benchmarks(df: pd.DataFrame) -> Iterator[Benchmark]:
+	num_cols = len(df.columns)
+	for name, output in representative_outputs(df).items():
+		yield f"count_df_values_in_output[{name}]", partial(count_df_values_in_output, output, num_cols)
+		yield f"is_allowed_summary_output[{name}]", partial(is_allowed_summary_output, output)
+
+
+def session_benchmarks(name: str, session: SandboxSession) -> Iterator[Benchmark]:
+	for expression_name, expression in EXPRESSIONS.items():
+		yield f"python_expression.{name}[{expression_name}]", partial(python_expression_tool, expression, session)
+
+	tool_handlers = {"python_expression": python_expression_tool, "submit_answer": submit_answer_tool}
+	yield f"run_agent_loop.{name}", partial(
+		run_agent_loop,
+		create_prompt(TEST_MAX_STEPS),
+		TOOLS,
+		tool_handlers,
+		TEST_MAX_STEPS,
+		verbose=False,
+		session=session,
+		backend=ScriptedBackend(),
+	)
+
+
+async def time_calls(function: Callable[[], Any], number: int) -> float:
+	start_time = time.perf_counter()
+	for _ in range(number):
+		result = function()
+		if inspect.isawaitable(result):
+			await result
+	return time.perf_counter() - start_time
+
+
+async def measure(function: Callable[[], Any], repeats: int, min_sample_seconds: float) -> dict[str, Any]:
+	# One warm-up call, then one timed call sizes the batch, as timeit's autorange does
+	await time_calls(function, 1)
+	single_call = await time_calls(function, 1)
+	number = max(1, math.ceil(min_sample_seconds / max(single_call, 1e-9)))
+	samples = [await time_calls(function, number) / number for _ in range(repeats)]
+	return {"median": statistics.median(samples), "min": min(samples), "number": number, "samples": samples}
+
+
+async def run_benchmarks(
+	num_rows: tuple[int, ...] = BENCHMARK_NUM_ROWS,
+	repeats: int = BENCHMARK_REPEATS,
+	min_sample_seconds: float = BENCHMARK_MIN_SAMPLE_SECONDS,
+	selection: str | None = None,
+) -> dict[str, Any]:
+	environment = get_environment()
+	sessions = {"inline": SandboxSession(environment.dataset), "process": ProcessSandboxSession(environment.dataset)}
+	benchmarks: dict[str, dict[str, Any]] = {}
+	try:
+		suites = [data_benchmarks(num_rows), output_benchmarks(environment.df)]
+		suites += [session_benchmarks(name, session) for name, session in sessions.items()]
+		for suite in suites:
+			for name, function in suite:
+				if selection is not None and selection not in name:
+					continue
+				benchmarks[name] = await measure(function, repeats, min_sample_seconds)
+				print(f"  {name:<56} {benchmarks[name]['median'] * 1000:12.3f} ms  (x{benchmarks[name]['number']})")
+	finally:
+		for session in sessions.values():
+			session.close()
+
+	return {
+		"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"repeats": repeats,
+		"benchmarks": benchmarks,
+	}
+
+
+def save_report(report: dict[str, Any], path: str) -> None:
+	os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+	temp_path = f"{path}.{os.getpid()}.tmp"
+	with open(temp_path, "w") as f:
+		json.dump(report, f, indent=2)
+	os.replace(temp_path, path)
+
+
+def load_report(path: str) -> dict[str, Any]:
+	with open(path) as f:
+		return json.load(f)
+
+
+def compare_reports(baseline: dict[str, Any], candidate: dict[str, Any], threshold: float = BENCHMARK_REGRESSION_THRESHOLD) -> list[str]:
+	if baseline["platform"] != candidate["platform"] or baseline["python"] != candidate["python"]:
+		print(f"Warning: baseline from {baseline['platform']} (Python {baseline['python']}), candidate from {candidate['platform']} (Python {candidate['python']})")
+
+	regressions = []
+	print(f"{'benchmark':<56} {'baseline ms':>12} {'candidate ms':>12} {'change':>8}")
+	for name, result in candidate["benchmarks"].items():
+		if name not in baseline["benchmarks"]:
+			print(f"{name:<56} {'-':>12} {result['median'] * 1000:12.3f} {'new':>8}")
+			continue
+		before = baseline["benchmarks"][name]["median"]
+		change = result["median"] / before - 1
+		flag = ""
+		if change > threshold:
+			regressions.append(name)
+			flag = "  REGRESSION"
+		elif change < -threshold:
+			flag = "  improved"
+		print(f"{name:<56} {before * 1000:12.3f} {result['median'] * 1000:12.3f} {change:+8.1%}{flag}")
+
+	for name in baseline["benchmarks"]:
+		if name not in candidate["benchmarks"]:
+			print(f"{name:<56} not run")
+
+	print(f"\n{len(regressions)} regression(s) beyond {threshold:.0%}")
+	return regressions
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--rows", type=int, nargs="+", default=list(BENCHMARK_NUM_ROWS))
+	parser.add_argument("--repeats", type=int, default=BENCHMARK_REPEATS)
+	parser.add_argument("--min-sample-seconds", type=float, default=BENCHMARK_MIN_SAMPLE_SECONDS)
+	parser.add_argument("--select", help="Only run benchmarks whose name contains this string")
+	subparsers = parser.add_subparsers(dest="command", required=True)
+	run_parser = subparsers.add_parser("run", help="Run the benchmarks and save a JSON report")
+	run_parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json"))
+	compare_parser = subparsers.add_parser("compare", help="Compare a report against a baseline, running the benchmarks if no report is given")
+	compare_parser.add_argument("baseline")
+	compare_parser.add_argument("candidate", nargs="?")
+	compare_parser.add_argument("--threshold", type=float, default=BENCHMARK_REGRESSION_THRESHOLD)
+	args = parser.parse_args()
+
+	if args.command == "compare" and args.candidate is not None:
+		report = load_report(args.candidate)
+	else:
+		report = asyncio.run(run_benchmarks(tuple(args.rows), args.repeats, args.min_sample_seconds, args.select))
+
+	if args.command == "run":
+		save_report(report, args.output)
+		print(f"Report written to {args.output}")
+	else:
+		sys.exit(1 if compare_reports(load_report(args.baseline), report, args.threshold) else 0)
@@ -0,0 +1,100 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .config import NUM_ROWS, RANDOM_SEED, TOLERANCE_MULTIPLIER, VECTORIZED_GENERATION
+from .environment import DataGenerator, fused_robust_means
+
+METHOD_NAMES = ("iqr", "zscore", "modified_zscore", "percentile")
+PERCENTILES = (5, 50, 95)
+
+
+def relative_errors(methods_results: np.ndarray, correct_means: np.ndarray) -> np.ndarray:
+	return np.abs(methods_results - correct_means[:, None]) / np.abs(correct_means[:, None]) * 100
+
+
+def tolerance_percents(errors: np.ndarray, multiplier: float = TOLERANCE_MULTIPLIER) -> np.ndarray:
+	return np.sort(errors, axis=1)[:, 1] * multiplier
+
+
+def calibrate_shard(seeds: list[int], num_rows: int, vectorized: bool, batch_size: int) -> tuple[np.ndarray, np.ndarray]:
+	errors = []
+	correct_means = []
+	for start in range(0, len(seeds), batch_size):
+		# Same generation path as get_environment and the task pool, so a reported seed reproduces its dataset there
+		generators = [DataGenerator(seed, num_rows, vectorized) for seed in seeds[start:start + batch_size]]
+		batch = np.stack([generator.generate_corrupted_dataset().to_numpy() for generator in generators])
+		batch_correct_means = np.array([generator.correct_mean for generator in generators])
+		errors.append(relative_errors(fused_robust_means(batch), batch_correct_means))
+		correct_means.append(batch_correct_means)
+	return np.concatenate(errors), np.concatenate(correct_means)
+
+
+def calibration_seeds(num_seeds: int, first_seed: int = RANDOM_SEED) -> list[int]:
+	# Consecutive integers, as TaskPool.build uses, so any of them can be set as RANDOM_SEED or listed in MATRIX_SEEDS
+	return [first_seed + index for index in range(num_seeds)]
+
+
+def run_calibration(
+	num_seeds: int,
+	num_rows: int = NUM_ROWS,
+	first_seed: int = RANDOM_SEED,
+	vectorized: bool = VECTORIZED_GENERATION,
+	workers: int | None = None,
+	batch_size: int = 64,
+) -> tuple[np.ndarray, np.ndarray]:
+	seeds = calibration_seeds(num_seeds, first_seed)
+	workers = workers or os.cpu_count() or 1
+	shard_size = max(1, -(-num_seeds // (workers * 4)))
+	shards = [seeds[start:start + shard_size] for start in range(0, num_seeds, shard_size)]
+
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		results = list(executor.map(calibrate_shard, shards, [num_rows] * len(shards), [vectorized] * len(shards), [batch_size] * len(shards)))
+	return np.concatenate([errors for errors, _ in results]), np.concatenate([means for _, means in results])
+
+
+def format_distribution(values: np.ndarray) -> str:
+	low, median, high = np.percentile(values, PERCENTILES)
+	return f"p{PERCENTILES[0]}={low:8.4f}  p{PERCENTILES[1]}={median:8.4f}  p{PERCENTILES[2]}={high:8.4f}  max={values.max():8.4f}"
+
+
+def print_report(errors: np.ndarray, multipliers: list[float], seeds: list[int]) -> None:
+	num_seeds = len(errors)
+	tolerances = tolerance_percents(errors, 1.0)
+	best_counts = np.bincount(errors.argmin(axis=1), minlength=len(METHOD_NAMES))
+
+	print("Relative error by method (%):")
+	for index, name in enumerate(METHOD_NAMES):
+		print(f"  {name:<16} {format_distribution(errors[:, index])}  best in {best_counts[index] / num_seeds:6.1%} of seeds")
+
+	print(f"\nPer-seed tolerance (second-best error, %):\n  {'':<16} {format_distribution(tolerances)}")
+
+	print("\nFixed tolerance -> fraction of seeds each method passes:")
+	for multiplier in multipliers:
+		tolerance = np.median(tolerances) * multiplier
+		pass_rates = "  ".join(f"{name}={np.mean(errors[:, index] <= tolerance):6.1%}" for index, name in enumerate(METHOD_NAMES))
+		print(f"  median x {multiplier:<6g} ({tolerance:7.4f}%)  {pass_rates}")
+
+	order = np.argsort(tolerances)
+	print(f"\nTightest seeds: {[seeds[index] for index in order[:5]]}")
+	print(f"Loosest seeds:  {[seeds[index] for index in order[-5:][::-1]]}")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--seeds", type=int, default=1000)
+	parser.add_argument("--rows", type=int, default=NUM_ROWS)
+	parser.add_argument("--first-seed", type=int, default=RANDOM_SEED)
+	parser.add_argument("--workers", type=int, default=None)
+	parser.add_argument("--batch-size", type=int, default=64)
+	parser.add_argument("--multipliers", type=float, nargs="+", default=[0.5, 1.0, TOLERANCE_MULTIPLIER, 1.5, 2.0])
+	args = parser.parse_args()
+
+	start_time = time.perf_counter()
+	errors, _ = run_calibration(args.seeds, args.rows, args.first_seed, workers=args.workers, batch_size=args.batch_size)
+	print(f"Calibrated seeds {args.first_seed}..{args.first_seed + args.seeds - 1} x {args.rows} rows in {time.perf_counter() - start_time:.2f}s")
+	print("=" * 100)
+	print_report(errors, args.multipliers, calibration_seeds(args.seeds, args.first_seed))
@@ -0,0 +1,53 @@
+from typing import Any
+
+from anthropic.types import MessageParam
+
+from .config import HISTORY_TOOL_RESULT_TOKEN_BUDGET, HISTORY_TRUNCATED_RESULT_CHARS
+from .scheduler import CHARS_PER_TOKEN
+
+
+def truncate_tool_result(block: dict[str, Any], max_chars: int) -> dict[str, Any]:
+	content = block["content"]
+	if not isinstance(content, str) or len(content) <= max_chars:
+		return block
+	return {
+		**block,
+		"content": f"{content[:max_chars]}... [truncated {len(content) - max_chars} characters]",
+	}
+
+
+def with_step_info(message: MessageParam, step_info: str) -> MessageParam:
+	content = message["content"]
+	if isinstance(content, str):
+		content = [{"type": "text", "text": content}]
+	return {**message, "content": [*content, {"type": "text", "text": step_info.strip()}]}
+
+
+def compact_messages(
+	messages: list[MessageParam],
+	step_info: str,
+	token_budget: int = HISTORY_TOOL_RESULT_TOKEN_BUDGET,
+	truncated_chars: int = HISTORY_TRUNCATED_RESULT_CHARS,
+) -> list[MessageParam]:
+	# Newest tool results stay whole until token_budget is spent; older ones are cut, never dropped
+	remaining = token_budget
+	compacted: list[MessageParam] = []
+	for position, message in enumerate(reversed(messages)):
+		content = message["content"]
+		if message["role"] == "user" and isinstance(content, list):
+			blocks = []
+			for block in content:
+				if isinstance(block, dict) and block.get("type") == "tool_result":
+					tokens = len(str(block["content"])) // CHARS_PER_TOKEN + 1
+					if position == 0 or tokens <= remaining:
+						remaining = max(0, remaining - tokens)
+					else:
+						remaining = 0
+						block = truncate_tool_result(block, truncated_chars)
+				blocks.append(block)
+			message = {**message, "content": blocks}
+		compacted.append(message)
+	compacted.reverse()
+
+	compacted[-1] = with_step_info(compacted[-1], step_info)
+	return compacted
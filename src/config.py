@@ -49,7 +49,9 @@ PERCENTILE_UPPER = 0.95
 
 TOLERANCE_MULTIPLIER = 1.001
 
-from src.environment import CORRECT_MEAN, TOLERANCE_ABSOLUTE
+VECTORIZED_GENERATION = False
+
+ENV_CACHE_DIR = ".cache/environments"
 
 # Debug configuration
 DEBUG = False
@@ -91,7 +93,97 @@ TEST_PROMPT = create_prompt(TEST_MAX_STEPS)
 TEST_VERBOSE = False
 
 # Execution configuration
-CONCURRENT = False
-
-EXPECTED_ANSWER = CORRECT_MEAN
-ANSWER_TOLERANCE = TOLERANCE_ABSOLUTE
+CONCURRENT = True
+MAX_CONCURRENT_RUNS = 5
+
+# Response cache configuration
+RESPONSE_CACHE_MODE = "passthrough"  # "passthrough", "record" or "replay"
+RESPONSE_CACHE_DIR = ".cache/responses"
+
+# Prompt caching configuration
+PROMPT_CACHING = False  # Mark the tool list and the task prompt as cacheable prefixes
+
+# History compaction configuration
+HISTORY_COMPACTION = False  # Fold step info notices and truncate old tool outputs in each request
+HISTORY_TOOL_RESULT_TOKEN_BUDGET = 2000  # Newest tool outputs kept verbatim up to this many tokens
+HISTORY_TRUNCATED_RESULT_CHARS = 100  # Characters kept from each older tool output
+
+# Streaming configuration
+STREAMING = False  # Stream responses and start python_expression calls as soon as their input is complete
+
+# Tool dispatch configuration
+# Run the tool calls of one response concurrently. This only helps independent, I/O-bound custom tools:
+# python_expression calls share the session lock and submit_answer is instant, so the default tools never overlap
+CONCURRENT_TOOL_CALLS = False
+
+# Tracing configuration
+TRACING = False  # Write per-step JSONL trace events and print a per-stage latency summary
+TRACE_DIR = ".cache/traces"
+
+# Expression profiling configuration
+PROFILE_EXPRESSIONS = False  # Record wall/CPU time, peak memory and cProfile hotspots of each expression in the trace
+PROFILE_TOP_FUNCTIONS = 5
+
+# Benchmark configuration
+BENCHMARK_NUM_ROWS = (150, 10_000, 100_000)
+BENCHMARK_REPEATS = 5
+BENCHMARK_MIN_SAMPLE_SECONDS = 0.05  # Fast calls are batched until one timed sample takes at least this long
+BENCHMARK_REGRESSION_THRESHOLD = 0.20  # Relative slowdown of the median per-call time reported as a regression
+BENCHMARK_DIR = ".cache/benchmarks"
+
+# Results store configuration
+RECORD_RESULTS = False  # Append every run outcome to a JSONL file keyed by the suite configuration
+RESUME_RESULTS = False  # Skip run IDs already recorded for the same suite configuration
+RESULTS_DIR = ".cache/results"
+
+# Adaptive early stopping configuration
+ADAPTIVE_STOPPING = False  # Treat NUM_RUNS as a budget and stop once the pass-rate interval clears the band
+TARGET_PASS_RATE_BAND = (0.10, 0.40)
+STOPPING_CONFIDENCE = 0.95
+MIN_ADAPTIVE_RUNS = 5
+
+# Out-of-core configuration
+OUT_OF_CORE = False  # Serve a chunk-generated, memory-mapped dataset of OUT_OF_CORE_NUM_ROWS rows
+OUT_OF_CORE_NUM_ROWS = 100_000_000
+OUT_OF_CORE_CHUNK_ROWS = 1_000_000
+OUT_OF_CORE_HISTOGRAM_BINS = 16_384  # Bins per pass when narrowing down exact order statistics
+OUT_OF_CORE_GATHER_LIMIT = 65_536  # Candidates at which order statistics are gathered and sorted
+
+# Task pool configuration
+TASK_POOL_SIZE = 0  # 0 serves the single RANDOM_SEED environment to every run
+TASK_POOL_DIR = ".cache/task_pools"
+
+# Sandbox configuration
+SANDBOX_BACKEND = "process"  # "process" or "inline"
+SANDBOX_TIMEOUT_SECONDS = 30.0
+SANDBOX_CPU_LIMIT_SECONDS = 20
+SANDBOX_MEMORY_LIMIT_MB = 4096
+
+# Output guard configuration
+OUTPUT_MAX_CHARS = 100_000
+OUTPUT_ABORT_MULTIPLIER = 10
+OUTPUT_INTERRUPT_ON_LIMIT = True
+OUTPUT_ACCOUNTING = "regex"  # "regex" scans printed lines, "source" also counts printed numbers that match a dataset value
+
+# HTTP connection pool configuration
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 30.0
+
+# Rate limit configuration
+REQUESTS_PER_MINUTE = 50
+INPUT_TOKENS_PER_MINUTE = 50_000
+OUTPUT_TOKENS_PER_MINUTE = 10_000
+MAX_API_RETRIES = 8
+RETRY_BACKOFF_BASE_SECONDS = 1.0
+RETRY_BACKOFF_MAX_SECONDS = 60.0
+
+# Matrix runner configuration
+MATRIX_MODELS = (DEFAULT_MODEL,)
+MATRIX_MAX_STEPS = (TEST_MAX_STEPS,)
+MATRIX_MAX_TOKENS = (MAX_TOKENS,)
+MATRIX_SEEDS = (RANDOM_SEED,)
+MATRIX_RUNS_PER_CELL = NUM_RUNS
+# Per-model overrides of max_concurrent_runs, requests_per_minute, input_tokens_per_minute and
+# output_tokens_per_minute; unlisted models get MAX_CONCURRENT_RUNS and the rate limits above
+MODEL_QUOTAS = {}
\ No newline at end of file
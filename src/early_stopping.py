@@ -0,0 +1,51 @@
+import math
+
+from scipy.stats import norm
+
+from .config import TARGET_PASS_RATE_BAND, STOPPING_CONFIDENCE, MIN_ADAPTIVE_RUNS
+
+
+def wilson_interval(successes: int, trials: int, confidence: float = STOPPING_CONFIDENCE) -> tuple[float, float]:
+	if trials == 0:
+		return 0.0, 1.0
+	z = float(norm.ppf(0.5 + confidence / 2))
+	proportion = successes / trials
+	denominator = 1 + z ** 2 / trials
+	center = (proportion + z ** 2 / (2 * trials)) / denominator
+	margin = z * math.sqrt(proportion * (1 - proportion) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+	return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class EarlyStopping:
+	def __init__(
+		self,
+		band: tuple[float, float] = TARGET_PASS_RATE_BAND,
+		confidence: float = STOPPING_CONFIDENCE,
+		min_runs: int = MIN_ADAPTIVE_RUNS,
+	) -> None:
+		self.band = band
+		self.confidence = confidence
+		self.min_runs = min_runs
+		self.successes = 0
+		self.trials = 0
+		self.decision: str | None = None
+
+	@property
+	def interval(self) -> tuple[float, float]:
+		return wilson_interval(self.successes, self.trials, self.confidence)
+
+	def update(self, success: bool) -> bool:
+		if self.decision is not None:
+			return True
+		self.successes += success
+		self.trials += 1
+		if self.trials < self.min_runs:
+			return False
+
+		lower, upper = self.interval
+		band_lower, band_upper = self.band
+		if band_lower <= lower and upper <= band_upper:
+			self.decision = "inside"
+		elif upper < band_lower or lower > band_upper:
+			self.decision = "outside"
+		return self.decision is not None
@@ -1,5 +1,11 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import NamedTuple
 import numpy as np
 import pandas as pd
+from src import config
 from src.config import (
     RANDOM_SEED, NUM_ROWS, NUM_COLS, CLEAN_DATA_FRACTION,
     CLEAN_DATA_MEAN, CLEAN_DATA_STD,
@@ -13,42 +19,61 @@ from src.config import (
     ZERO_CORRUPTION_ROWS_FRACTION, ZERO_CORRUPTION_MIN_COLS, ZERO_CORRUPTION_MAX_COLS,
     IQR_BOUNDARY_ROWS_FRACTION, IQR_BOUNDARY_MIN_SIGMA, IQR_BOUNDARY_MAX_SIGMA,
     IQR_MULTIPLIER, ZSCORE_THRESHOLD, MODIFIED_ZSCORE_CONSTANT, MODIFIED_ZSCORE_THRESHOLD,
-    PERCENTILE_LOWER, PERCENTILE_UPPER, TOLERANCE_MULTIPLIER
+    PERCENTILE_LOWER, PERCENTILE_UPPER, TOLERANCE_MULTIPLIER, VECTORIZED_GENERATION,
+    ENV_CACHE_DIR
 )
 
+ENV_CACHE_VERSION = 1
+
+GENERATION_CONFIG_NAMES = [
+    'NUM_COLS', 'CLEAN_DATA_FRACTION', 'CLEAN_DATA_MEAN', 'CLEAN_DATA_STD',
+    'NOISE_UNIFORM_RANGE', 'NOISE_NORMAL_STD', 'NOISE_MULTIPLICATIVE_RANGE',
+    'NOISE_EXPONENTIAL_SCALE', 'NOISE_LAPLACE_SCALE',
+    'MODERATE_OUTLIER_FRACTION', 'MODERATE_OUTLIER_MIN_SIGMA', 'MODERATE_OUTLIER_MAX_SIGMA',
+    'OUTLIER_NEGATION_FREQUENCY',
+    'DUPLICATE_ROWS_FRACTION', 'SIGN_FLIP_ROWS_FRACTION', 'SIGN_FLIP_MIN_COLS', 'SIGN_FLIP_MAX_COLS',
+    'DECIMAL_SHIFT_ROWS_FRACTION', 'DECIMAL_SHIFT_MIN_COLS', 'DECIMAL_SHIFT_MAX_COLS', 'DECIMAL_SHIFT_MULTIPLIER',
+    'MISSING_VALUE_ROWS_FRACTION', 'MISSING_VALUE_MIN_COLS', 'MISSING_VALUE_MAX_COLS',
+    'ZERO_CORRUPTION_ROWS_FRACTION', 'ZERO_CORRUPTION_MIN_COLS', 'ZERO_CORRUPTION_MAX_COLS',
+    'IQR_BOUNDARY_ROWS_FRACTION', 'IQR_BOUNDARY_MIN_SIGMA', 'IQR_BOUNDARY_MAX_SIGMA',
+    'IQR_MULTIPLIER', 'ZSCORE_THRESHOLD', 'MODIFIED_ZSCORE_CONSTANT', 'MODIFIED_ZSCORE_THRESHOLD',
+    'PERCENTILE_LOWER', 'PERCENTILE_UPPER',
+]
+
 
 class DataGenerator:
-    def __init__(self):
-        np.random.seed(RANDOM_SEED)
-        self.num_clean_rows = int(NUM_ROWS * CLEAN_DATA_FRACTION)
-        self.num_duplicate_rows = int(NUM_ROWS * DUPLICATE_ROWS_FRACTION)
-        self.num_sign_flip_rows = int(NUM_ROWS * SIGN_FLIP_ROWS_FRACTION)
-        self.num_decimal_shift_rows = int(NUM_ROWS * DECIMAL_SHIFT_ROWS_FRACTION)
-        self.num_missing_value_rows = int(NUM_ROWS * MISSING_VALUE_ROWS_FRACTION)
-        self.num_zero_corruption_rows = int(NUM_ROWS * ZERO_CORRUPTION_ROWS_FRACTION)
-        self.num_iqr_boundary_rows = int(NUM_ROWS * IQR_BOUNDARY_ROWS_FRACTION)
-        self.num_moderate_outliers = int(NUM_ROWS * MODERATE_OUTLIER_FRACTION)
+    def __init__(self, seed=RANDOM_SEED, num_rows=NUM_ROWS, vectorized=VECTORIZED_GENERATION):
+        self.vectorized = vectorized
+        self.rng = np.random.default_rng(seed) if vectorized else np.random.RandomState(seed)
+        self.num_clean_rows = int(num_rows * CLEAN_DATA_FRACTION)
+        self.num_duplicate_rows = int(num_rows * DUPLICATE_ROWS_FRACTION)
+        self.num_sign_flip_rows = int(num_rows * SIGN_FLIP_ROWS_FRACTION)
+        self.num_decimal_shift_rows = int(num_rows * DECIMAL_SHIFT_ROWS_FRACTION)
+        self.num_missing_value_rows = int(num_rows * MISSING_VALUE_ROWS_FRACTION)
+        self.num_zero_corruption_rows = int(num_rows * ZERO_CORRUPTION_ROWS_FRACTION)
+        self.num_iqr_boundary_rows = int(num_rows * IQR_BOUNDARY_ROWS_FRACTION)
+        self.num_moderate_outliers = int(num_rows * MODERATE_OUTLIER_FRACTION)
         
         self.clean_data = self._generate_clean_data()
         self.correct_mean = self.clean_data.mean()
     
     def _generate_clean_data(self):
-        return np.random.normal(loc=CLEAN_DATA_MEAN, scale=CLEAN_DATA_STD, size=(self.num_clean_rows, NUM_COLS))
+        return self.rng.normal(loc=CLEAN_DATA_MEAN, scale=CLEAN_DATA_STD, size=(self.num_clean_rows, NUM_COLS))
     
     def _add_noise(self, data):
         data_with_noise = data.copy()
         
         for col_idx in range(NUM_COLS):
             if col_idx == 0:
-                noise = np.random.uniform(-NOISE_UNIFORM_RANGE, NOISE_UNIFORM_RANGE, size=self.num_clean_rows)
+                noise = self.rng.uniform(-NOISE_UNIFORM_RANGE, NOISE_UNIFORM_RANGE, size=self.num_clean_rows)
             elif col_idx == 1:
-                noise = np.random.normal(0, NOISE_NORMAL_STD, size=self.num_clean_rows)
+                noise = self.rng.normal(0, NOISE_NORMAL_STD, size=self.num_clean_rows)
             elif col_idx == 2:
-                noise = data_with_noise[:, col_idx] * np.random.uniform(-NOISE_MULTIPLICATIVE_RANGE, NOISE_MULTIPLICATIVE_RANGE, size=self.num_clean_rows)
+                noise = data_with_noise[:, col_idx] * self.rng.uniform(-NOISE_MULTIPLICATIVE_RANGE, NOISE_MULTIPLICATIVE_RANGE, size=self.num_clean_rows)
             elif col_idx == 3:
-                noise = np.random.exponential(NOISE_EXPONENTIAL_SCALE, size=self.num_clean_rows) - NOISE_EXPONENTIAL_SCALE
+                noise = self.rng.exponential(NOISE_EXPONENTIAL_SCALE, size=self.num_clean_rows) - NOISE_EXPONENTIAL_SCALE
             elif col_idx == 4:
-                noise = np.random.laplace(0, NOISE_LAPLACE_SCALE, size=self.num_clean_rows)
+                noise = self.rng.laplace(0, NOISE_LAPLACE_SCALE, size=self.num_clean_rows)
             
             data_with_noise[:, col_idx] += noise
         
@@ -57,34 +82,49 @@ class DataGenerator:
     def _generate_moderate_outliers(self):
         outlier_min = CLEAN_DATA_MEAN + MODERATE_OUTLIER_MIN_SIGMA * CLEAN_DATA_STD
         outlier_max = CLEAN_DATA_MEAN + MODERATE_OUTLIER_MAX_SIGMA * CLEAN_DATA_STD
-        moderate_outliers = np.random.uniform(outlier_min, outlier_max, size=(self.num_moderate_outliers, NUM_COLS))
-        
-        for i in range(self.num_moderate_outliers):
-            if i % OUTLIER_NEGATION_FREQUENCY == 0:
-                moderate_outliers[i] *= -1
+        moderate_outliers = self.rng.uniform(outlier_min, outlier_max, size=(self.num_moderate_outliers, NUM_COLS))
+        moderate_outliers[::OUTLIER_NEGATION_FREQUENCY] *= -1
         
         return moderate_outliers
     
     def _generate_duplicate_rows(self, data):
-        duplicate_indices = np.random.choice(self.num_clean_rows, size=self.num_duplicate_rows, replace=True)
+        duplicate_indices = self.rng.choice(self.num_clean_rows, size=self.num_duplicate_rows, replace=True)
         return data[duplicate_indices]
     
+    def _select_rows_and_column_mask(self, data, num_rows, min_cols, max_cols):
+        rows = data[self.rng.choice(self.num_clean_rows, size=num_rows, replace=False)].copy()
+        cols_per_row = self.rng.integers(min_cols, max_cols, size=num_rows)
+        column_ranks = self.rng.random((num_rows, NUM_COLS)).argsort(axis=1).argsort(axis=1)
+        return rows, column_ranks < cols_per_row[:, None]
+    
     def _generate_sign_flip_rows(self, data):
-        sign_flip_rows = data[np.random.choice(self.num_clean_rows, size=self.num_sign_flip_rows, replace=False)].copy()
+        if self.vectorized:
+            sign_flip_rows, flip_mask = self._select_rows_and_column_mask(data, self.num_sign_flip_rows, SIGN_FLIP_MIN_COLS, SIGN_FLIP_MAX_COLS)
+            sign_flip_rows[flip_mask] *= -1
+            return sign_flip_rows
+        
+        sign_flip_rows = data[self.rng.choice(self.num_clean_rows, size=self.num_sign_flip_rows, replace=False)].copy()
         
         for i in range(self.num_sign_flip_rows):
-            flip_cols = np.random.choice(NUM_COLS, size=np.random.randint(SIGN_FLIP_MIN_COLS, SIGN_FLIP_MAX_COLS), replace=False)
+            flip_cols = self.rng.choice(NUM_COLS, size=self.rng.randint(SIGN_FLIP_MIN_COLS, SIGN_FLIP_MAX_COLS), replace=False)
             sign_flip_rows[i, flip_cols] *= -1
         
         return sign_flip_rows
     
     def _generate_decimal_shift_rows(self, data):
-        decimal_shift_rows = data[np.random.choice(self.num_clean_rows, size=self.num_decimal_shift_rows, replace=False)].copy()
+        if self.vectorized:
+            decimal_shift_rows, shift_mask = self._select_rows_and_column_mask(data, self.num_decimal_shift_rows, DECIMAL_SHIFT_MIN_COLS, DECIMAL_SHIFT_MAX_COLS)
+            multiply = self.rng.random(decimal_shift_rows.shape) > 0.5
+            decimal_shift_rows[shift_mask & multiply] *= DECIMAL_SHIFT_MULTIPLIER
+            decimal_shift_rows[shift_mask & ~multiply] /= DECIMAL_SHIFT_MULTIPLIER
+            return decimal_shift_rows
+        
+        decimal_shift_rows = data[self.rng.choice(self.num_clean_rows, size=self.num_decimal_shift_rows, replace=False)].copy()
         
         for i in range(self.num_decimal_shift_rows):
-            shift_cols = np.random.choice(NUM_COLS, size=np.random.randint(DECIMAL_SHIFT_MIN_COLS, DECIMAL_SHIFT_MAX_COLS), replace=False)
+            shift_cols = self.rng.choice(NUM_COLS, size=self.rng.randint(DECIMAL_SHIFT_MIN_COLS, DECIMAL_SHIFT_MAX_COLS), replace=False)
             for col in shift_cols:
-                if np.random.rand() > 0.5:
+                if self.rng.rand() > 0.5:
                     decimal_shift_rows[i, col] *= DECIMAL_SHIFT_MULTIPLIER
                 else:
                     decimal_shift_rows[i, col] /= DECIMAL_SHIFT_MULTIPLIER
@@ -92,19 +132,29 @@ class DataGenerator:
         return decimal_shift_rows
     
     def _generate_missing_value_rows(self, data):
-        missing_value_rows = data[np.random.choice(self.num_clean_rows, size=self.num_missing_value_rows, replace=False)].copy()
+        if self.vectorized:
+            missing_value_rows, nan_mask = self._select_rows_and_column_mask(data, self.num_missing_value_rows, MISSING_VALUE_MIN_COLS, MISSING_VALUE_MAX_COLS)
+            missing_value_rows[nan_mask] = np.nan
+            return missing_value_rows
+        
+        missing_value_rows = data[self.rng.choice(self.num_clean_rows, size=self.num_missing_value_rows, replace=False)].copy()
         
         for i in range(self.num_missing_value_rows):
-            nan_cols = np.random.choice(NUM_COLS, size=np.random.randint(MISSING_VALUE_MIN_COLS, MISSING_VALUE_MAX_COLS), replace=False)
+            nan_cols = self.rng.choice(NUM_COLS, size=self.rng.randint(MISSING_VALUE_MIN_COLS, MISSING_VALUE_MAX_COLS), replace=False)
             missing_value_rows[i, nan_cols] = np.nan
         
         return missing_value_rows
     
     def _generate_zero_corruption_rows(self, data):
-        zero_corruption_rows = data[np.random.choice(self.num_clean_rows, size=self.num_zero_corruption_rows, replace=False)].copy()
+        if self.vectorized:
+            zero_corruption_rows, zero_mask = self._select_rows_and_column_mask(data, self.num_zero_corruption_rows, ZERO_CORRUPTION_MIN_COLS, ZERO_CORRUPTION_MAX_COLS)
+            zero_corruption_rows[zero_mask] = 0
+            return zero_corruption_rows
+        
+        zero_corruption_rows = data[self.rng.choice(self.num_clean_rows, size=self.num_zero_corruption_rows, replace=False)].copy()
         
         for i in range(self.num_zero_corruption_rows):
-            zero_cols = np.random.choice(NUM_COLS, size=np.random.randint(ZERO_CORRUPTION_MIN_COLS, ZERO_CORRUPTION_MAX_COLS), replace=False)
+            zero_cols = self.rng.choice(NUM_COLS, size=self.rng.randint(ZERO_CORRUPTION_MIN_COLS, ZERO_CORRUPTION_MAX_COLS), replace=False)
             zero_corruption_rows[i, zero_cols] = 0
         
         return zero_corruption_rows
@@ -112,13 +162,13 @@ class DataGenerator:
     def _generate_iqr_boundary_outliers(self):
         half = self.num_iqr_boundary_rows // 2
         
-        upper_values = np.random.uniform(
+        upper_values = self.rng.uniform(
             CLEAN_DATA_MEAN + IQR_BOUNDARY_MIN_SIGMA * CLEAN_DATA_STD,
             CLEAN_DATA_MEAN + IQR_BOUNDARY_MAX_SIGMA * CLEAN_DATA_STD,
             size=(half, NUM_COLS)
         )
         
-        lower_values = np.random.uniform(
+        lower_values = self.rng.uniform(
             CLEAN_DATA_MEAN - IQR_BOUNDARY_MAX_SIGMA * CLEAN_DATA_STD,
             CLEAN_DATA_MEAN - IQR_BOUNDARY_MIN_SIGMA * CLEAN_DATA_STD,
             size=(self.num_iqr_boundary_rows - half, NUM_COLS)
@@ -142,7 +192,7 @@ class DataGenerator:
             self._generate_iqr_boundary_outliers(),
         ])
         
-        np.random.shuffle(all_data)
+        all_data = all_data[self.rng.permutation(len(all_data))]
         
         return pd.DataFrame(all_data, columns=[f'feature_{i}' for i in range(NUM_COLS)])
 
@@ -189,16 +239,100 @@ class DataProcessor:
         return df_cleaned.values.mean()
 
 
+def _lerp(lower, upper, fraction):
+    difference = upper - lower
+    return np.where(fraction >= 0.5, upper - difference * (1 - fraction), lower + difference * fraction)
+
+
+def _sorted_quantile(sorted_data, counts, q):
+    virtual_index = counts * q + (1 - q) - 1
+    lower_index = np.floor(virtual_index).astype(np.intp)
+    upper_index = np.minimum(lower_index + 1, counts - 1)
+    lower = np.take_along_axis(sorted_data, lower_index[:, None, None], axis=1)[:, 0, :]
+    upper = np.take_along_axis(sorted_data, upper_index[:, None, None], axis=1)[:, 0, :]
+    return _lerp(lower, upper, (virtual_index - lower_index)[:, None])
+
+
+def _sorted_median(sorted_data, counts):
+    lower_index = (counts - 1) // 2
+    upper_index = counts // 2
+    lower = np.take_along_axis(sorted_data, lower_index[:, None, None], axis=1)[:, 0, :]
+    upper = np.take_along_axis(sorted_data, upper_index[:, None, None], axis=1)[:, 0, :]
+    return np.where((counts % 2 == 0)[:, None], (lower + upper) / 2, lower)
+
+
+def _masked_mean(data, row_mask):
+    kept_rows = row_mask.sum(axis=1)
+    kept_sum = np.where(row_mask[..., None], data, 0.0).sum(axis=(1, 2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return kept_sum / (kept_rows * data.shape[2])
+
+
+def fused_robust_means(data):
+    valid = ~np.isnan(data).any(axis=2)
+    counts = valid.sum(axis=1)
+    data = np.where(valid[..., None], data, np.nan)
+    sorted_data = np.sort(data, axis=1)
+    
+    q1 = _sorted_quantile(sorted_data, counts, 0.25)[:, None, :]
+    q3 = _sorted_quantile(sorted_data, counts, 0.75)[:, None, :]
+    percentile_lower = _sorted_quantile(sorted_data, counts, PERCENTILE_LOWER)[:, None, :]
+    percentile_upper = _sorted_quantile(sorted_data, counts, PERCENTILE_UPPER)[:, None, :]
+    median = _sorted_median(sorted_data, counts)[:, None, :]
+    
+    deviations = np.abs(data - median)
+    mad = _sorted_median(np.sort(deviations, axis=1), counts)[:, None, :]
+    
+    column_counts = counts[:, None, None]
+    column_sum = np.where(valid[..., None], data, 0.0).sum(axis=1, keepdims=True)
+    mean = column_sum / column_counts
+    squared_deviations = np.where(valid[..., None], (data - mean) ** 2, 0.0)
+    std = np.sqrt(squared_deviations.sum(axis=1, keepdims=True) / (column_counts - 1))
+    
+    iqr = q3 - q1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        iqr_mask = valid & ~((data < q1 - IQR_MULTIPLIER * iqr) | (data > q3 + IQR_MULTIPLIER * iqr)).any(axis=2)
+        zscore_mask = valid & (np.abs((data - mean) / std) < ZSCORE_THRESHOLD).all(axis=2)
+        modified_zscore_mask = valid & (np.abs(MODIFIED_ZSCORE_CONSTANT * (data - median) / mad) < MODIFIED_ZSCORE_THRESHOLD).all(axis=2)
+    percentile_mask = valid & ~((data < percentile_lower) | (data > percentile_upper)).any(axis=2)
+    
+    return np.stack([
+        _masked_mean(data, iqr_mask),
+        _masked_mean(data, zscore_mask),
+        _masked_mean(data, modified_zscore_mask),
+        _masked_mean(data, percentile_mask),
+    ], axis=1)
+
+
+class FusedDataProcessor:
+    def __init__(self, data):
+        self.data = np.asarray(data, dtype=float)
+    
+    def calculate_means(self):
+        return [float(result) for result in fused_robust_means(self.data[None])[0]]
+
+
+class SharedDataset(NamedTuple):
+    data_path: str
+    columns: tuple[str, ...]
+    index: int | None = None
+
+
+@lru_cache(maxsize=None)
+def load_shared_dataframe(dataset):
+    data = np.load(dataset.data_path, mmap_mode="r")
+    if dataset.index is not None:
+        data = data[dataset.index]
+    return pd.DataFrame(data, columns=list(dataset.columns), copy=False)
+
+
 class Environment:
-    def __init__(self):
-        self.data_generator = DataGenerator()
-        self.df = self.data_generator.generate_corrupted_dataset()
-        self.processor = DataProcessor(self.df)
+    def __init__(self, df, correct_mean, methods_results, dataset=None):
+        self.df = df
+        self.dataset = dataset
+        self.correct_mean = float(correct_mean)
         
-        self.iqr_result = self.processor.calculate_mean_iqr_method()
-        self.zscore_result = self.processor.calculate_mean_zscore_method()
-        self.modified_zscore_result = self.processor.calculate_mean_modified_zscore_method()
-        self.percentile_result = self.processor.calculate_mean_percentile_method()
+        self.iqr_result, self.zscore_result, self.modified_zscore_result, self.percentile_result = methods_results
         
         self.methods_results = [
             self.iqr_result,
@@ -209,17 +343,45 @@ class Environment:
         
         self._calculate_tolerance()
     
+    @classmethod
+    def generate(cls, seed=RANDOM_SEED, num_rows=NUM_ROWS, vectorized=VECTORIZED_GENERATION):
+        data_generator = DataGenerator(seed, num_rows, vectorized)
+        df = data_generator.generate_corrupted_dataset()
+        return cls(df, data_generator.correct_mean, FusedDataProcessor(df.to_numpy()).calculate_means())
+    
+    @classmethod
+    def load(cls, path):
+        with open(f"{path}.json") as f:
+            metadata = json.load(f)
+        dataset = SharedDataset(f"{path}.npy", tuple(metadata["columns"]))
+        return cls(load_shared_dataframe(dataset), metadata["correct_mean"], metadata["methods_results"], dataset)
+    
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        metadata = {
+            "columns": list(self.df.columns),
+            "correct_mean": self.correct_mean,
+            "methods_results": [float(result) for result in self.methods_results],
+        }
+        temp_suffix = f".{os.getpid()}.tmp"
+        with open(f"{path}.npy{temp_suffix}", "wb") as f:
+            np.save(f, self.df.to_numpy())
+        os.replace(f"{path}.npy{temp_suffix}", f"{path}.npy")
+        with open(f"{path}.json{temp_suffix}", "w") as f:
+            json.dump(metadata, f)
+        os.replace(f"{path}.json{temp_suffix}", f"{path}.json")
+    
     def _calculate_tolerance(self):
         relative_errors = [
-            abs(result - self.data_generator.correct_mean) / abs(self.data_generator.correct_mean) * 100
+            abs(result - self.correct_mean) / abs(self.correct_mean) * 100
             for result in self.methods_results
         ]
         self.tolerance_percent = sorted(relative_errors)[1] * TOLERANCE_MULTIPLIER
-        self.tolerance_absolute = abs(self.data_generator.correct_mean) * self.tolerance_percent / 100
+        self.tolerance_absolute = abs(self.correct_mean) * self.tolerance_percent / 100
     
     @property
     def CORRECT_MEAN(self):
-        return self.data_generator.correct_mean
+        return self.correct_mean
     
     @property
     def TOLERANCE_PERCENT(self):
@@ -230,14 +392,50 @@ class Environment:
         return self.tolerance_absolute
 
 
-env = Environment()
+def environment_cache_key(seed=RANDOM_SEED, num_rows=NUM_ROWS, vectorized=VECTORIZED_GENERATION):
+    generation_params = {
+        "version": ENV_CACHE_VERSION,
+        "seed": seed,
+        "num_rows": num_rows,
+        "vectorized": vectorized,
+        "config": {name: getattr(config, name) for name in GENERATION_CONFIG_NAMES},
+    }
+    encoded = json.dumps(generation_params, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+_environments: dict[str, Environment] = {}
+
+
+def get_environment(seed=RANDOM_SEED, num_rows=NUM_ROWS, vectorized=VECTORIZED_GENERATION):
+    key = environment_cache_key(seed, num_rows, vectorized)
+    if key in _environments:
+        return _environments[key]
+    
+    path = os.path.join(ENV_CACHE_DIR, key)
+    if not os.path.exists(f"{path}.json"):
+        Environment.generate(seed, num_rows, vectorized).save(path)
+    
+    environment = Environment.load(path)
+    _environments[key] = environment
+    return environment
+
+
+_LAZY_ATTRIBUTES = {
+    "env": lambda environment: environment,
+    "CORRECT_MEAN": lambda environment: environment.CORRECT_MEAN,
+    "TOLERANCE_PERCENT": lambda environment: environment.TOLERANCE_PERCENT,
+    "TOLERANCE_ABSOLUTE": lambda environment: environment.TOLERANCE_ABSOLUTE,
+    "df": lambda environment: environment.df,
+    "iqr_result": lambda environment: environment.iqr_result,
+    "zscore_result": lambda environment: environment.zscore_result,
+    "modified_zscore_result": lambda environment: environment.modified_zscore_result,
+    "percentile_result": lambda environment: environment.percentile_result,
+    "methods_results": lambda environment: environment.methods_results,
+}
+
 
-CORRECT_MEAN = env.CORRECT_MEAN
-TOLERANCE_PERCENT = env.TOLERANCE_PERCENT
-TOLERANCE_ABSOLUTE = env.TOLERANCE_ABSOLUTE
-df = env.df
-iqr_result = env.iqr_result
-zscore_result = env.zscore_result
-modified_zscore_result = env.modified_zscore_result
-percentile_result = env.percentile_result
-methods_results = env.methods_results
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name](get_environment())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
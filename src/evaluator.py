@@ -1,10 +1,28 @@
+import time
 from collections.abc import Callable
-from typing import Any
+from typing import Any, TypedDict
 
+from anthropic import AsyncAnthropic
 from anthropic.types import ToolUnionParam
 
-from .agent import run_agent_loop
-from .config import DEBUG, TEST_MAX_STEPS
+from .agent import ModelBackend, PromptCacheStats, run_agent_loop
+from .config import DEBUG, DEFAULT_MODEL, MAX_TOKENS, TEST_MAX_STEPS
+from .environment import SharedDataset
+from .response_cache import ResponseCache
+from .sandbox import create_session
+from .scheduler import RequestScheduler
+from .tracing import Tracer
+
+
+class TestRunResult(TypedDict):
+	run_id: int
+	success: bool
+	result: Any
+	duration: float
+	cache_hits: int
+	cache_misses: int
+	cache_read_tokens: int
+	cache_creation_tokens: int
 
 
 async def run_single_test(
@@ -16,7 +34,16 @@ async def run_single_test(
 	expected_answer: Any,
 	tolerance: float = 0.0,
 	verbose: bool = False,
-) -> tuple[int, bool, Any]:
+	scheduler: RequestScheduler | None = None,
+	client: AsyncAnthropic | None = None,
+	response_cache: ResponseCache | None = None,
+	backend: ModelBackend | None = None,
+	dataset: SharedDataset | None = None,
+	tracer: Tracer | None = None,
+	model: str = DEFAULT_MODEL,
+	max_steps: int = TEST_MAX_STEPS,
+	max_tokens: int = MAX_TOKENS,
+) -> TestRunResult:
 	if verbose:
 		print(f"\n\n{'=' * 20} RUN {run_id}/{num_runs} {'=' * 20}")
 	
@@ -25,13 +52,29 @@ async def run_single_test(
 		print(f"[DEBUG] Expected answer: {expected_answer}")
 		print(f"[DEBUG] Prompt: {prompt[:100]}...")
 
-	result = await run_agent_loop(
-		prompt=prompt,
-		tools=tools,
-		tool_handlers=tool_handlers,
-		max_steps=TEST_MAX_STEPS,
-		verbose=verbose,
-	)
+	start_time = time.perf_counter()
+	session = create_session(dataset)
+	cache_stats = PromptCacheStats()
+	run_tracer = tracer.scoped(run_id) if tracer is not None else None
+	try:
+		result = await run_agent_loop(
+			prompt=prompt,
+			tools=tools,
+			tool_handlers=tool_handlers,
+			max_steps=max_steps,
+			model=model,
+			verbose=verbose,
+			session=session,
+			scheduler=scheduler,
+			client=client,
+			response_cache=response_cache.scoped(run_id) if response_cache is not None else None,
+			backend=backend,
+			cache_stats=cache_stats,
+			tracer=run_tracer,
+			max_tokens=max_tokens,
+		)
+	finally:
+		session.close()
 
 	if result is None:
 		# Handle case where agent didn't submit an answer
@@ -69,5 +112,18 @@ async def run_single_test(
 		else:
 			print(f"✗ Run {run_id}: FAILURE - Got {result}, expected {expected_answer}")
 
-	return run_id, success, result
+	duration = time.perf_counter() - start_time
+	if run_tracer is not None:
+		run_tracer.emit("run_result", duration=duration, success=success, result=result, expected_answer=expected_answer, tolerance=tolerance)
+
+	return {
+		"run_id": run_id,
+		"success": success,
+		"result": result,
+		"duration": duration,
+		"cache_hits": cache_stats.hits,
+		"cache_misses": cache_stats.misses,
+		"cache_read_tokens": cache_stats.read_tokens,
+		"cache_creation_tokens": cache_stats.creation_tokens,
+	}
 
@@ -0,0 +1,150 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .agent import scripted_content
+
+FAKE_SERVER_EXPRESSION = "print(df.dropna().values.mean())"
+
+
+class FakeMessagesServer(ThreadingHTTPServer):
+	def __init__(
+		self,
+		address: tuple[str, int],
+		throttle_probability: float = 0.0,
+		overload_probability: float = 0.0,
+		retry_after: float | None = None,
+		latency: float = 0.0,
+	) -> None:
+		super().__init__(address, FakeMessagesHandler)
+		self.throttle_probability = throttle_probability
+		self.overload_probability = overload_probability
+		self.retry_after = retry_after
+		self.latency = latency
+		self.lock = threading.Lock()
+		self.request_count = 0
+		self.throttled_count = 0
+		self.overloaded_count = 0
+
+	@property
+	def base_url(self) -> str:
+		host, port = self.server_address[:2]
+		return f"http://{host}:{port}"
+
+
+class FakeMessagesHandler(BaseHTTPRequestHandler):
+	server: FakeMessagesServer
+
+	def log_message(self, format: str, *args) -> None:
+		pass
+
+	def _send_json(self, status: int, body: dict, headers: dict[str, str] | None = None) -> None:
+		encoded = json.dumps(body).encode()
+		self.send_response(status)
+		self.send_header("content-type", "application/json")
+		self.send_header("content-length", str(len(encoded)))
+		for name, value in (headers or {}).items():
+			self.send_header(name, value)
+		self.end_headers()
+		self.wfile.write(encoded)
+
+	def _send_event_stream(self, message: dict) -> None:
+		self.send_response(200)
+		self.send_header("content-type", "text/event-stream")
+		self.send_header("cache-control", "no-cache")
+		self.end_headers()
+
+		def send_event(event_type: str, data: dict) -> None:
+			self.wfile.write(f"event: {event_type}\ndata: {json.dumps({'type': event_type, **data})}\n\n".encode())
+			self.wfile.flush()
+
+		content = message["content"]
+		send_event("message_start", {"message": {**message, "content": [], "stop_reason": None, "usage": {**message["usage"], "output_tokens": 1}}})
+		for index, block in enumerate(content):
+			send_event("content_block_start", {"index": index, "content_block": {**block, "input": {}}})
+			send_event("content_block_delta", {"index": index, "delta": {"type": "input_json_delta", "partial_json": json.dumps(block["input"])}})
+			send_event("content_block_stop", {"index": index})
+		if self.server.latency:
+			time.sleep(self.server.latency / 2)
+		send_event("message_delta", {"delta": {"stop_reason": message["stop_reason"], "stop_sequence": None}, "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+		send_event("message_stop", {})
+
+	def _send_error(self, status: int, error_type: str) -> None:
+		headers = {} if self.server.retry_after is None else {"retry-after": str(self.server.retry_after)}
+		self._send_json(status, {"type": "error", "error": {"type": error_type, "message": "Injected by fake server"}}, headers)
+
+	def do_POST(self) -> None:
+		body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+		if not self.path.startswith("/v1/messages"):
+			self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+			return
+
+		roll = random.random()
+		with self.server.lock:
+			self.server.request_count += 1
+			throttled = roll < self.server.throttle_probability
+			overloaded = not throttled and roll < self.server.throttle_probability + self.server.overload_probability
+			self.server.throttled_count += throttled
+			self.server.overloaded_count += overloaded
+
+		if throttled:
+			self._send_error(429, "rate_limit_error")
+			return
+		if overloaded:
+			self._send_error(529, "overloaded_error")
+			return
+
+		streaming = body.get("stream", False)
+		if self.server.latency:
+			time.sleep(self.server.latency / 2 if streaming else self.server.latency)
+		messages = body["messages"]
+		input_tokens = len(json.dumps(messages)) // 4
+		message = {
+			"id": f"msg_{uuid.uuid4().hex[:24]}",
+			"type": "message",
+			"role": "assistant",
+			"model": body["model"],
+			"content": scripted_content(messages, FAKE_SERVER_EXPRESSION),
+			"stop_reason": "tool_use",
+			"stop_sequence": None,
+			"usage": {"input_tokens": input_tokens, "output_tokens": 20},
+		}
+		if streaming:
+			self._send_event_stream(message)
+		else:
+			self._send_json(200, message)
+
+
+def start_fake_server(
+	port: int = 0,
+	throttle_probability: float = 0.0,
+	overload_probability: float = 0.0,
+	retry_after: float | None = None,
+	latency: float = 0.0,
+) -> FakeMessagesServer:
+	server = FakeMessagesServer(("127.0.0.1", port), throttle_probability, overload_probability, retry_after, latency)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--throttle", type=float, default=0.2)
+	parser.add_argument("--overload", type=float, default=0.05)
+	parser.add_argument("--retry-after", type=float, default=None)
+	parser.add_argument("--latency", type=float, default=0.1)
+	args = parser.parse_args()
+
+	server = FakeMessagesServer(("127.0.0.1", args.port), args.throttle, args.overload, args.retry_after, args.latency)
+	print(f"Fake messages API listening on {server.base_url} (set ANTHROPIC_BASE_URL to use it)")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		print(f"Requests: {server.request_count}, throttled: {server.throttled_count}, overloaded: {server.overloaded_count}")
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from collections.abc import Callable
+from contextlib import redirect_stdout
+from typing import Any
+
+import numpy as np
+from anthropic.types import Message, ToolUseBlock
+
+from .agent import ScriptedBackend
+from .test_runner import run_test_suite
+from .tools import python_expression_tool, submit_answer_tool
+
+PERCENTILES = (50, 95, 99)
+RSS_SAMPLE_INTERVAL_SECONDS = 0.05
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+class TimedBackend:
+	def __init__(self, backend: ScriptedBackend) -> None:
+		self.backend = backend
+		self.durations: list[float] = []
+
+	async def create_message(self, **request: Any) -> Message:
+		start_time = time.perf_counter()
+		response = await self.backend.create_message(**request)
+		self.durations.append(time.perf_counter() - start_time)
+		return response
+
+	async def stream_message(
+		self,
+		on_attempt: Callable[[], None],
+		on_first_token: Callable[[], None],
+		on_tool_use: Callable[[ToolUseBlock], None],
+		**request: Any,
+	) -> Message:
+		start_time = time.perf_counter()
+		response = await self.backend.stream_message(on_attempt, on_first_token, on_tool_use, **request)
+		self.durations.append(time.perf_counter() - start_time)
+		return response
+
+
+def timed_handler(handler: Callable[..., Any], durations: list[float]) -> Callable[..., Any]:
+	async def run(*args: Any) -> Any:
+		start_time = time.perf_counter()
+		result = await handler(*args)
+		durations.append(time.perf_counter() - start_time)
+		return result
+	return run
+
+
+def format_percentiles(durations: list[float]) -> str:
+	if not durations:
+		return "n/a"
+	values = np.percentile(durations, PERCENTILES) * 1000
+	return " / ".join(f"{value:8.1f}" for value in values)
+
+
+def current_rss_mb(pid: int | str = "self") -> float:
+	try:
+		with open(f"/proc/{pid}/statm") as f:
+			return int(f.read().split()[1]) * PAGE_SIZE / 2**20
+	except (FileNotFoundError, ProcessLookupError):
+		# The worker exited between listing and reading
+		return 0.0
+
+
+async def sample_peak_rss(peaks: dict[str, float]) -> None:
+	# ru_maxrss is a lifetime high-water mark, so sample what is resident while this level runs
+	while True:
+		peaks["harness"] = max(peaks["harness"], current_rss_mb())
+		peaks["sandbox"] = max(peaks["sandbox"], sum(current_rss_mb(child.pid) for child in multiprocessing.active_children()))
+		await asyncio.sleep(RSS_SAMPLE_INTERVAL_SECONDS)
+
+
+async def run_load_level(concurrency: int, num_runs: int, policy: str, latency: float) -> dict[str, Any]:
+	backend = TimedBackend(ScriptedBackend(policy, latency))
+	tool_durations: list[float] = []
+	tool_handlers = {
+		"python_expression": timed_handler(python_expression_tool, tool_durations),
+		"submit_answer": submit_answer_tool,
+	}
+
+	peaks = {"harness": 0.0, "sandbox": 0.0}
+	sampler = asyncio.create_task(sample_peak_rss(peaks))
+	start_time = time.perf_counter()
+	with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+		results = await run_test_suite(
+			concurrent=True,
+			num_runs=num_runs,
+			max_concurrent_runs=concurrency,
+			backend=backend,
+			tool_handlers=tool_handlers,
+			record_results=False,
+		)
+	elapsed = time.perf_counter() - start_time
+	sampler.cancel()
+
+	return {
+		"concurrency": concurrency,
+		"elapsed": elapsed,
+		"throughput": num_runs / elapsed,
+		"passed": sum(1 for result in results if result["success"]),
+		"rollout": [result["duration"] for result in results],
+		"model": backend.durations,
+		"tool": tool_durations,
+		"peak_rss_mb": peaks["harness"],
+		"peak_sandbox_rss_mb": peaks["sandbox"],
+	}
+
+
+async def run_load_test(concurrency_levels: list[int], num_runs: int, policy: str, latency: float) -> None:
+	print(f"Load test: {num_runs} rollouts per level, policy={policy}, model latency={latency * 1000:.0f}ms")
+	print(f"Latency columns are p{PERCENTILES[0]} / p{PERCENTILES[1]} / p{PERCENTILES[2]} in ms")
+	print("=" * 120)
+	for concurrency in concurrency_levels:
+		level = await run_load_level(concurrency, num_runs, policy, latency)
+		print(f"concurrency={level['concurrency']:<4} rollouts/s={level['throughput']:8.2f} wall={level['elapsed']:7.2f}s passed={level['passed']}/{num_runs}")
+		print(f"  rollout: {format_percentiles(level['rollout'])}")
+		print(f"  model:   {format_percentiles(level['model'])}")
+		print(f"  tool:    {format_percentiles(level['tool'])}")
+		print(f"  peak RSS: harness {level['peak_rss_mb']:.0f} MB, sandbox workers {level['peak_sandbox_rss_mb']:.0f} MB total")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+	parser.add_argument("--runs", type=int, default=64)
+	parser.add_argument("--policy", default="calculate_mean_iqr_method")
+	parser.add_argument("--latency", type=float, default=0.05)
+	args = parser.parse_args()
+
+	asyncio.run(run_load_test(args.concurrency, args.runs, args.policy, args.latency))
@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import itertools
+import time
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+from .agent import ModelBackend, ScriptedBackend, create_client
+from .config import (
+	MATRIX_MODELS, MATRIX_MAX_STEPS, MATRIX_MAX_TOKENS, MATRIX_SEEDS, MATRIX_RUNS_PER_CELL, MODEL_QUOTAS,
+	MAX_CONCURRENT_RUNS, RECORD_RESULTS, RESUME_RESULTS, TEST_VERBOSE, create_prompt,
+)
+from .early_stopping import wilson_interval
+from .environment import environment_cache_key, get_environment
+from .evaluator import TestRunResult, run_single_test
+from .response_cache import ResponseCache
+from .results_store import ResultsStore
+from .scheduler import RequestScheduler
+from .test_runner import TOOLS, suite_key
+from .tools import python_expression_tool, submit_answer_tool
+
+
+class MatrixCell(NamedTuple):
+	model: str
+	max_steps: int
+	max_tokens: int
+	seed: int
+
+
+class CellReport:
+	def __init__(
+		self,
+		cell: MatrixCell,
+		num_runs: int,
+		results_store: ResultsStore | None,
+		completed: dict[int, Any],
+		response_cache: ResponseCache,
+	) -> None:
+		self.cell = cell
+		self.num_runs = num_runs
+		self.results_store = results_store
+		self.response_cache = response_cache
+		self.results: list[TestRunResult] = [completed[run_id] for run_id in sorted(completed) if run_id <= num_runs]
+		self.started_at: float | None = None
+		self.finished_at: float | None = None
+
+	def pending_run_ids(self) -> list[int]:
+		recorded = {result["run_id"] for result in self.results}
+		return [run_id for run_id in range(1, self.num_runs + 1) if run_id not in recorded]
+
+	@property
+	def done(self) -> bool:
+		return len(self.results) >= self.num_runs
+
+	def record(self, result: TestRunResult) -> None:
+		self.results.append(result)
+		self.finished_at = time.perf_counter()
+		if self.results_store is not None:
+			self.results_store.append(result)
+
+	def format_row(self) -> str:
+		passed = sum(1 for result in self.results if result["success"])
+		runs = len(self.results)
+		lower, upper = wilson_interval(passed, runs)
+		mean_duration = sum(result["duration"] for result in self.results) / runs if runs else 0.0
+		wall = self.finished_at - self.started_at if self.started_at is not None and self.finished_at is not None else 0.0
+		pass_rate = passed / runs if runs else 0.0
+		return (
+			f"{self.cell.model:<28} {self.cell.max_steps:>5} {self.cell.max_tokens:>6} {self.cell.seed:>6} "
+			f"{passed:>4}/{runs:<4} {pass_rate:7.1%}  [{lower:6.1%}, {upper:6.1%}]  {mean_duration:8.2f}s {wall:8.2f}s"
+		)
+
+
+REPORT_HEADER = f"{'model':<28} {'steps':>5} {'tokens':>6} {'seed':>6} {'passed':>9} {'rate':>7}  {'95% interval':<18}  {'mean run':>9} {'cell wall':>9}"
+
+
+def build_grid(
+	models: tuple[str, ...] = MATRIX_MODELS,
+	max_steps: tuple[int, ...] = MATRIX_MAX_STEPS,
+	max_tokens: tuple[int, ...] = MATRIX_MAX_TOKENS,
+	seeds: tuple[int, ...] = MATRIX_SEEDS,
+) -> list[MatrixCell]:
+	return [MatrixCell(*values) for values in itertools.product(models, max_steps, max_tokens, seeds)]
+
+
+def model_quota(model: str) -> tuple[asyncio.Semaphore, RequestScheduler]:
+	quota = {"max_concurrent_runs": MAX_CONCURRENT_RUNS, **MODEL_QUOTAS.get(model, {})}
+	semaphore = asyncio.Semaphore(int(quota.pop("max_concurrent_runs")))
+	return semaphore, RequestScheduler(**quota)
+
+
+async def run_matrix(
+	cells: list[MatrixCell],
+	num_runs: int = MATRIX_RUNS_PER_CELL,
+	backend: ModelBackend | None = None,
+	tool_handlers: dict[str, Callable[..., Any]] | None = None,
+	record_results: bool = RECORD_RESULTS,
+	resume: bool = RESUME_RESULTS,
+) -> list[CellReport]:
+	if tool_handlers is None:
+		tool_handlers = {
+			"python_expression": python_expression_tool,
+			"submit_answer": submit_answer_tool,
+		}
+
+	# Each model gets its own concurrency limit and rate-limit buckets, so a slow or throttled model does not hold back the others
+	quotas = {model: model_quota(model) for model in dict.fromkeys(cell.model for cell in cells)}
+	environments = {seed: get_environment(seed) for seed in dict.fromkeys(cell.seed for cell in cells)}
+	response_cache = ResponseCache()
+	reports = []
+	for cell in cells:
+		prompt = create_prompt(cell.max_steps)
+		results_key = suite_key(prompt, environment_cache_key(cell.seed), backend, cell.model, cell.max_tokens, cell.max_steps)
+		results_store = ResultsStore(results_key) if record_results or resume else None
+		completed = results_store.completed() if resume else {}
+		# Cells that differ only in seed send the same first request, so recorded responses are kept per cell
+		reports.append(CellReport(cell, num_runs, results_store, completed, response_cache.scoped(results_key)))
+
+	# Interleave the cells so every cell makes progress from the start and the sweep ends with its slowest cell
+	pending = [
+		(report, run_id)
+		for run_ids in itertools.zip_longest(*(report.pending_run_ids() for report in reports))
+		for report, run_id in zip(reports, run_ids)
+		if run_id is not None
+	]
+
+	print(f"Running a {len(cells)}-cell matrix, {num_runs} runs per cell ({len(pending)} rollouts to go)...")
+	print("=" * len(REPORT_HEADER))
+	print(REPORT_HEADER)
+	for report in reports:
+		if report.done:
+			print(report.format_row() + "  (recorded)")
+
+	start_time = time.perf_counter()
+	async with create_client() as client:
+		async def run_rollout(report: CellReport, run_id: int) -> tuple[CellReport, TestRunResult]:
+			cell = report.cell
+			environment = environments[cell.seed]
+			semaphore, scheduler = quotas[cell.model]
+			async with semaphore:
+				if report.started_at is None:
+					report.started_at = time.perf_counter()
+				result = await run_single_test(
+					run_id=run_id,
+					num_runs=num_runs,
+					prompt=create_prompt(cell.max_steps),
+					tools=TOOLS,
+					tool_handlers=tool_handlers,
+					expected_answer=environment.CORRECT_MEAN,
+					tolerance=environment.TOLERANCE_ABSOLUTE,
+					verbose=TEST_VERBOSE,
+					scheduler=scheduler,
+					client=client,
+					response_cache=report.response_cache,
+					backend=backend,
+					dataset=environment.dataset,
+					model=cell.model,
+					max_steps=cell.max_steps,
+					max_tokens=cell.max_tokens,
+				)
+			return report, result
+
+		# Stream each cell's row as soon as its last rollout finishes
+		for future in asyncio.as_completed([run_rollout(report, run_id) for report, run_id in pending]):
+			report, result = await future
+			report.record(result)
+			if report.done:
+				print(report.format_row())
+
+	elapsed = time.perf_counter() - start_time
+	print(f"\n{'=' * len(REPORT_HEADER)}")
+	print("Matrix results:")
+	print(REPORT_HEADER)
+	for report in reports:
+		print(report.format_row())
+	cell_walls = [report.finished_at - report.started_at for report in reports if report.started_at is not None and report.finished_at is not None]
+	if cell_walls:
+		print(f"  Sweep wall time: {elapsed:.2f}s (slowest cell {max(cell_walls):.2f}s, cells summed {sum(cell_walls):.2f}s)")
+	throttled = sum(scheduler.throttled_count for _, scheduler in quotas.values())
+	if throttled:
+		print(f"  Throttled API calls retried: {throttled}")
+	failed = sum(scheduler.failed_count for _, scheduler in quotas.values())
+	if failed:
+		print(f"  Failed API calls retried: {failed}")
+	print("=" * len(REPORT_HEADER))
+
+	return reports
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--models", nargs="+", default=list(MATRIX_MODELS))
+	parser.add_argument("--max-steps", type=int, nargs="+", default=list(MATRIX_MAX_STEPS))
+	parser.add_argument("--max-tokens", type=int, nargs="+", default=list(MATRIX_MAX_TOKENS))
+	parser.add_argument("--seeds", type=int, nargs="+", default=list(MATRIX_SEEDS))
+	parser.add_argument("--runs", type=int, default=MATRIX_RUNS_PER_CELL)
+	parser.add_argument("--resume", action="store_true", default=RESUME_RESULTS)
+	parser.add_argument("--policy", help="Run offline against ScriptedBackend with this DataProcessor method")
+	parser.add_argument("--latency", type=float, default=0.05, help="Scripted model latency in seconds")
+	args = parser.parse_args()
+
+	cells = build_grid(tuple(args.models), tuple(args.max_steps), tuple(args.max_tokens), tuple(args.seeds))
+	backend = ScriptedBackend(args.policy, args.latency) if args.policy else None
+	asyncio.run(run_matrix(cells, args.runs, backend, resume=args.resume))
@@ -0,0 +1,271 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections.abc import Callable, Iterator
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from .config import (
+	NUM_COLS, RANDOM_SEED, IQR_MULTIPLIER, ZSCORE_THRESHOLD, MODIFIED_ZSCORE_CONSTANT, MODIFIED_ZSCORE_THRESHOLD,
+	PERCENTILE_LOWER, PERCENTILE_UPPER, ENV_CACHE_DIR,
+	OUT_OF_CORE_NUM_ROWS, OUT_OF_CORE_CHUNK_ROWS, OUT_OF_CORE_HISTOGRAM_BINS, OUT_OF_CORE_GATHER_LIMIT,
+)
+from .environment import DataGenerator, Environment, _lerp, environment_cache_key
+
+SIGN_MASK = np.int64(0x7FFF_FFFF_FFFF_FFFF)
+
+
+def read_chunks(path: str, chunk_rows: int, valid_only: bool = True) -> Iterator[np.ndarray]:
+	# Plain reads rather than slicing a memmap, so pages that were already processed are not kept mapped
+	header = np.load(path, mmap_mode="r")
+	num_rows, num_cols = header.shape
+	offset = header.offset
+	del header
+	with open(path, "rb") as f:
+		f.seek(offset)
+		for start in range(0, num_rows, chunk_rows):
+			count = min(chunk_rows, num_rows - start)
+			chunk = np.fromfile(f, dtype=np.float64, count=count * num_cols).reshape(count, num_cols)
+			yield chunk[~np.isnan(chunk).any(axis=1)] if valid_only else chunk
+
+
+class ChunkedDataGenerator:
+	def __init__(self, seed: int = RANDOM_SEED, num_rows: int = OUT_OF_CORE_NUM_ROWS, chunk_rows: int = OUT_OF_CORE_CHUNK_ROWS) -> None:
+		self.num_rows = num_rows
+		self.chunk_rows = chunk_rows
+		self.seed_sequence = np.random.SeedSequence(seed)
+		self.num_chunks = -(-num_rows // chunk_rows)
+		self.clean_sum = 0.0
+		self.clean_count = 0
+
+	@property
+	def correct_mean(self) -> float:
+		return self.clean_sum / self.clean_count
+
+	def write_shuffled_dataset(self, path: str) -> int:
+		# Two-pass shuffle: rows scatter to random bucket files, then each bucket is shuffled in memory
+		chunk_seeds, shuffle_seed = self.seed_sequence.spawn(self.num_chunks), self.seed_sequence.spawn(1)[0]
+		shuffle_rng = np.random.default_rng(shuffle_seed)
+		bucket_paths = [f"{path}.bucket{index}" for index in range(self.num_chunks)]
+
+		total_rows = 0
+		for index, chunk_seed in enumerate(chunk_seeds):
+			rows = min(self.chunk_rows, self.num_rows - index * self.chunk_rows)
+			generator = DataGenerator(chunk_seed, rows, vectorized=True)
+			self.clean_sum += float(generator.clean_data.sum())
+			self.clean_count += generator.clean_data.size
+			chunk = generator.generate_corrupted_dataset().to_numpy()
+			total_rows += len(chunk)
+
+			buckets = shuffle_rng.integers(0, self.num_chunks, size=len(chunk))
+			order = np.argsort(buckets, kind="stable")
+			boundaries = np.searchsorted(buckets[order], np.arange(self.num_chunks + 1))
+			for bucket, (start, end) in enumerate(zip(boundaries[:-1], boundaries[1:])):
+				if end > start:
+					with open(bucket_paths[bucket], "ab") as f:
+						f.write(chunk[order[start:end]].tobytes())
+
+		output = open_memmap(path, mode="w+", dtype=np.float64, shape=(total_rows, NUM_COLS))
+		offset = output.offset
+		del output
+		with open(path, "r+b") as f:
+			f.seek(offset)
+			for bucket_path in bucket_paths:
+				if not os.path.exists(bucket_path):
+					continue
+				bucket = np.fromfile(bucket_path, dtype=np.float64).reshape(-1, NUM_COLS)
+				f.write(bucket[shuffle_rng.permutation(len(bucket))].tobytes())
+				os.remove(bucket_path)
+		return total_rows
+
+
+def _sortable_keys(values: np.ndarray) -> np.ndarray:
+	# Maps float64 to int64 so that integer order matches float order (the mapping is its own inverse)
+	bits = np.ascontiguousarray(values).view(np.int64)
+	return bits ^ ((bits >> 63) & SIGN_MASK)
+
+
+def _key_value(key: int) -> float:
+	return float(_sortable_keys(np.array([key], dtype=np.int64)).view(np.float64)[0])
+
+
+def select_order_statistics(
+	read_values: Callable[[], Iterator[np.ndarray]],
+	ranks: list[int],
+	bins: int = OUT_OF_CORE_HISTOGRAM_BINS,
+	gather_limit: int = OUT_OF_CORE_GATHER_LIMIT,
+) -> np.ndarray:
+	# Each pass narrows every target's key interval to the histogram bin holding its rank
+	num_targets = len(ranks)
+	low = [[-2 ** 63] * num_targets for _ in range(NUM_COLS)]
+	high = [[2 ** 63 - 1] * num_targets for _ in range(NUM_COLS)]
+	below = [[0] * num_targets for _ in range(NUM_COLS)]
+	candidates = [[None] * num_targets for _ in range(NUM_COLS)]
+	results = np.full((NUM_COLS, num_targets), np.nan)
+	unresolved = {(col, target) for col in range(NUM_COLS) for target in range(num_targets)}
+
+	while unresolved:
+		gather = {key for key in unresolved if candidates[key[0]][key[1]] is not None and candidates[key[0]][key[1]] <= gather_limit}
+		steps = {key: -(-(high[key[0]][key[1]] - low[key[0]][key[1]] + 1) // bins) for key in unresolved - gather}
+		histograms = {key: np.zeros(bins, dtype=np.int64) for key in steps}
+		gathered: dict[tuple[int, int], list[np.ndarray]] = {key: [] for key in gather}
+
+		# Targets that share a column and an interval (typical in the first passes) share one scan
+		intervals: dict[tuple[int, int, int], list[tuple[int, int]]] = {}
+		for col, target in unresolved:
+			intervals.setdefault((col, low[col][target], high[col][target]), []).append((col, target))
+
+		for chunk in read_values():
+			keys = _sortable_keys(chunk)
+			for (col, interval_low, interval_high), targets in intervals.items():
+				column_keys = keys[:, col]
+				in_range = column_keys[(column_keys >= np.int64(interval_low)) & (column_keys <= np.int64(interval_high))]
+				histogram_counts = {}
+				for key in targets:
+					if key in gather:
+						gathered[key].append(in_range)
+						continue
+					if steps[key] not in histogram_counts:
+						offsets = (in_range - np.int64(interval_low)).view(np.uint64) // np.uint64(steps[key])
+						histogram_counts[steps[key]] = np.bincount(offsets.astype(np.intp), minlength=bins)
+					histograms[key] += histogram_counts[steps[key]]
+
+		for col, target in list(unresolved):
+			rank = ranks[target] - below[col][target]
+			if (col, target) in gather:
+				values = np.sort(np.concatenate(gathered[col, target]))
+				results[col, target] = _key_value(int(values[rank]))
+				unresolved.discard((col, target))
+				continue
+
+			cumulative = np.cumsum(histograms[col, target])
+			bin_index = int(np.searchsorted(cumulative, rank, side="right"))
+			below[col][target] += int(cumulative[bin_index - 1]) if bin_index else 0
+			candidates[col][target] = int(histograms[col, target][bin_index])
+			low[col][target] += bin_index * steps[col, target]
+			high[col][target] = min(high[col][target], low[col][target] + steps[col, target] - 1)
+			if low[col][target] == high[col][target]:
+				results[col, target] = _key_value(low[col][target])
+				unresolved.discard((col, target))
+	return results
+
+
+class StreamingDataProcessor:
+	def __init__(self, path: str, chunk_rows: int = OUT_OF_CORE_CHUNK_ROWS) -> None:
+		self.path = path
+		self.chunk_rows = chunk_rows
+
+	def _chunks(self) -> Iterator[np.ndarray]:
+		return read_chunks(self.path, self.chunk_rows)
+
+	def calculate_means(self) -> list[float]:
+		count = 0
+		column_sum = np.zeros(NUM_COLS)
+		for chunk in self._chunks():
+			count += len(chunk)
+			column_sum += chunk.sum(axis=0)
+		mean = column_sum / count
+
+		squared_deviations = np.zeros(NUM_COLS)
+		for chunk in self._chunks():
+			squared_deviations += ((chunk - mean) ** 2).sum(axis=0)
+		std = np.sqrt(squared_deviations / (count - 1))
+
+		# Same interpolation as FusedDataProcessor, on exact order statistics
+		quantile_positions = {q: count * q + (1 - q) - 1 for q in (0.25, 0.75, PERCENTILE_LOWER, PERCENTILE_UPPER)}
+		median_ranks = [(count - 1) // 2, count // 2]
+		ranks = sorted({rank for position in quantile_positions.values() for rank in (int(position), min(int(position) + 1, count - 1))} | set(median_ranks))
+		order_statistics = dict(zip(ranks, select_order_statistics(self._chunks, ranks).T))
+
+		def quantile(q: float) -> np.ndarray:
+			position = quantile_positions[q]
+			lower_index = int(position)
+			upper_index = min(lower_index + 1, count - 1)
+			return _lerp(order_statistics[lower_index], order_statistics[upper_index], position - lower_index)
+
+		def median_of(values: dict[int, np.ndarray]) -> np.ndarray:
+			lower, upper = values[median_ranks[0]], values[median_ranks[1]]
+			return (lower + upper) / 2 if count % 2 == 0 else lower
+
+		q1, q3 = quantile(0.25), quantile(0.75)
+		percentile_lower, percentile_upper = quantile(PERCENTILE_LOWER), quantile(PERCENTILE_UPPER)
+		median = median_of(order_statistics)
+
+		def absolute_deviations() -> Iterator[np.ndarray]:
+			for chunk in self._chunks():
+				yield np.abs(chunk - median)
+
+		mad = median_of(dict(zip(median_ranks, select_order_statistics(absolute_deviations, median_ranks).T)))
+
+		iqr = q3 - q1
+		kept_rows = np.zeros(4, dtype=np.int64)
+		kept_sums = np.zeros(4)
+		for chunk in self._chunks():
+			with np.errstate(invalid="ignore", divide="ignore"):
+				masks = [
+					~((chunk < q1 - IQR_MULTIPLIER * iqr) | (chunk > q3 + IQR_MULTIPLIER * iqr)).any(axis=1),
+					(np.abs((chunk - mean) / std) < ZSCORE_THRESHOLD).all(axis=1),
+					(np.abs(MODIFIED_ZSCORE_CONSTANT * (chunk - median) / mad) < MODIFIED_ZSCORE_THRESHOLD).all(axis=1),
+					~((chunk < percentile_lower) | (chunk > percentile_upper)).any(axis=1),
+				]
+			for index, mask in enumerate(masks):
+				kept_rows[index] += mask.sum()
+				kept_sums[index] += chunk[mask].sum()
+		return [float(value) for value in kept_sums / (kept_rows * NUM_COLS)]
+
+
+def out_of_core_cache_key(seed: int = RANDOM_SEED, num_rows: int = OUT_OF_CORE_NUM_ROWS, chunk_rows: int = OUT_OF_CORE_CHUNK_ROWS) -> str:
+	encoded = f"{environment_cache_key(seed, num_rows, True)}:out-of-core:{chunk_rows}".encode()
+	return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def build_out_of_core_environment(path: str, seed: int = RANDOM_SEED, num_rows: int = OUT_OF_CORE_NUM_ROWS, chunk_rows: int = OUT_OF_CORE_CHUNK_ROWS) -> None:
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	temp_suffix = f".{os.getpid()}.tmp"
+	generator = ChunkedDataGenerator(seed, num_rows, chunk_rows)
+	generator.write_shuffled_dataset(f"{path}.npy{temp_suffix}")
+	methods_results = StreamingDataProcessor(f"{path}.npy{temp_suffix}", chunk_rows).calculate_means()
+	os.replace(f"{path}.npy{temp_suffix}", f"{path}.npy")
+
+	metadata = {
+		"columns": [f"feature_{i}" for i in range(NUM_COLS)],
+		"correct_mean": generator.correct_mean,
+		"methods_results": methods_results,
+	}
+	with open(f"{path}.json{temp_suffix}", "w") as f:
+		json.dump(metadata, f)
+	os.replace(f"{path}.json{temp_suffix}", f"{path}.json")
+
+
+_out_of_core_environments: dict[str, Environment] = {}
+
+
+def get_out_of_core_environment(seed: int = RANDOM_SEED, num_rows: int = OUT_OF_CORE_NUM_ROWS, chunk_rows: int = OUT_OF_CORE_CHUNK_ROWS) -> Environment:
+	key = out_of_core_cache_key(seed, num_rows, chunk_rows)
+	if key in _out_of_core_environments:
+		return _out_of_core_environments[key]
+
+	path = os.path.join(ENV_CACHE_DIR, f"out-of-core-{key}")
+	if not os.path.exists(f"{path}.json"):
+		build_out_of_core_environment(path, seed, num_rows, chunk_rows)
+
+	environment = Environment.load(path)
+	_out_of_core_environments[key] = environment
+	return environment
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--rows", type=int, default=OUT_OF_CORE_NUM_ROWS)
+	parser.add_argument("--chunk-rows", type=int, default=OUT_OF_CORE_CHUNK_ROWS)
+	parser.add_argument("--seed", type=int, default=RANDOM_SEED)
+	args = parser.parse_args()
+
+	start_time = time.perf_counter()
+	environment = get_out_of_core_environment(args.seed, args.rows, args.chunk_rows)
+	print(f"Out-of-core environment with {len(environment.df)} rows ready in {time.perf_counter() - start_time:.2f}s ({environment.dataset.data_path})")
+	print(f"Correct mean: {environment.CORRECT_MEAN}, tolerance: ±{environment.TOLERANCE_ABSOLUTE:.6f}")
+	print(f"Method results: {environment.methods_results}")
@@ -0,0 +1,74 @@
+import re
+from functools import lru_cache
+from typing import Protocol
+
+import numpy as np
+
+from .environment import SharedDataset, load_shared_dataframe
+
+# Integer digits, fraction digits and exponent of a printed decimal number
+DECIMAL_PATTERN = re.compile(r'[-+]?(\d*)\.(\d+)(?:[eE]([-+]?\d+))?')
+# Shorter numbers (counts, labels, rounded summaries) match some dataset value by coincidence
+MIN_SIGNIFICANT_DIGITS = 6
+# Order statistics that describe() prints are summaries rather than leaked rows
+SUMMARY_QUANTILES = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+
+class ValueCounter(Protocol):
+	@property
+	def value_count(self) -> int: ...
+
+	def feed_line(self, line: str) -> None: ...
+
+
+def parse_decimals(line: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+	values = []
+	tolerances = []
+	significant = []
+	for match in DECIMAL_PATTERN.finditer(line):
+		integer_digits, fraction_digits, exponent = match.groups()
+		significant_digits = len(integer_digits.lstrip('0') + fraction_digits) if integer_digits.lstrip('0') else len(fraction_digits.lstrip('0'))
+		decimals = len(fraction_digits) - int(exponent or 0)
+		values.append(float(match.group()))
+		tolerances.append(0.5 * 10.0 ** -decimals * (1 + 1e-6))
+		significant.append(significant_digits >= MIN_SIGNIFICANT_DIGITS)
+	return np.array(values), np.array(tolerances), np.array(significant, dtype=bool)
+
+
+def match_source_values(sorted_values: np.ndarray, values: np.ndarray, tolerances: np.ndarray) -> np.ndarray:
+	if not sorted_values.size or not values.size:
+		return np.zeros(values.shape, dtype=bool)
+	index = np.searchsorted(sorted_values, values)
+	below = sorted_values[np.clip(index - 1, 0, sorted_values.size - 1)]
+	above = sorted_values[np.clip(index, 0, sorted_values.size - 1)]
+	distance = np.minimum(np.abs(values - below), np.abs(values - above))
+	return distance <= tolerances
+
+
+@lru_cache(maxsize=None)
+def load_sorted_source_values(dataset: SharedDataset) -> np.ndarray:
+	frame = load_shared_dataframe(dataset)
+	values = frame.to_numpy(dtype=float).ravel()
+	summary_values = frame.quantile(SUMMARY_QUANTILES).to_numpy(dtype=float).ravel()
+	return np.sort(values[np.isfinite(values) & ~np.isin(values, summary_values)])
+
+
+class SourceValueCounter:
+	def __init__(self, dataset: SharedDataset, backstop: ValueCounter) -> None:
+		self.sorted_values = load_sorted_source_values(dataset)
+		self.backstop = backstop
+		self.source_value_count = 0
+
+	@property
+	def value_count(self) -> int:
+		return max(self.source_value_count, self.backstop.value_count)
+
+	def feed_line(self, line: str) -> None:
+		values, tolerances, significant = parse_decimals(line)
+		if not values.size:
+			return
+		matched = match_source_values(self.sorted_values, values, tolerances)
+		self.source_value_count += int(np.count_nonzero(matched & significant))
+		# Rounded values are too short to count on their own, so the row counter only sees lines that mostly hold dataset values
+		if 2 * np.count_nonzero(matched) > values.size:
+			self.backstop.feed_line(line)
@@ -0,0 +1,70 @@
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+from typing import Any, TypedDict
+
+from .config import PROFILE_TOP_FUNCTIONS
+
+
+class Hotspot(TypedDict):
+	function: str
+	calls: int
+	total_time: float
+	cumulative_time: float
+
+
+class ExpressionProfile(TypedDict):
+	wall_time: float
+	cpu_time: float
+	peak_memory_bytes: int
+	hotspots: list[Hotspot]
+
+
+def _function_label(key: tuple[str, int, str]) -> str:
+	filename, line, name = key
+	if filename == "~":
+		return name
+	return f"{os.path.basename(filename)}:{line}({name})"
+
+
+class ExpressionProfiler:
+	def __init__(self, top_functions: int = PROFILE_TOP_FUNCTIONS) -> None:
+		self.top_functions = top_functions
+		self.profiler = cProfile.Profile()
+		self.started_tracemalloc = False
+		self.wall_time = 0.0
+		self.cpu_time = 0.0
+		self.peak_memory_bytes = 0
+
+	def __enter__(self) -> "ExpressionProfiler":
+		self.started_tracemalloc = not tracemalloc.is_tracing()
+		if self.started_tracemalloc:
+			tracemalloc.start()
+		tracemalloc.reset_peak()
+		self.wall_start = time.perf_counter()
+		self.cpu_start = time.process_time()
+		self.profiler.enable()
+		return self
+
+	def __exit__(self, *exc_info: Any) -> None:
+		self.profiler.disable()
+		self.cpu_time = time.process_time() - self.cpu_start
+		self.wall_time = time.perf_counter() - self.wall_start
+		self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+		if self.started_tracemalloc:
+			tracemalloc.stop()
+
+	def summary(self) -> ExpressionProfile:
+		stats = pstats.Stats(self.profiler).stats
+		ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top_functions]
+		return {
+			"wall_time": self.wall_time,
+			"cpu_time": self.cpu_time,
+			"peak_memory_bytes": self.peak_memory_bytes,
+			"hotspots": [
+				{"function": _function_label(key), "calls": calls, "total_time": total_time, "cumulative_time": cumulative_time}
+				for key, (_, calls, total_time, cumulative_time, _) in ranked
+			],
+		}
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from anthropic.types import Message
+
+from .config import RESPONSE_CACHE_MODE, RESPONSE_CACHE_DIR
+
+RESPONSE_CACHE_MODES = ("passthrough", "record", "replay")
+
+
+class ResponseCacheMiss(Exception):
+	pass
+
+
+def _to_jsonable(value: Any) -> Any:
+	if hasattr(value, "model_dump"):
+		return value.model_dump(mode="json")
+	raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def canonical_request_hash(request: dict[str, Any], scope: str = "") -> str:
+	canonical = json.dumps(
+		{
+			"scope": scope,
+			"model": request["model"],
+			"max_tokens": request["max_tokens"],
+			"tools": request.get("tools"),
+			"messages": request["messages"],
+		},
+		sort_keys=True,
+		separators=(",", ":"),
+		default=_to_jsonable,
+	)
+	return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResponseCache:
+	def __init__(self, mode: str = RESPONSE_CACHE_MODE, directory: str = RESPONSE_CACHE_DIR, scope: str = "") -> None:
+		assert mode in RESPONSE_CACHE_MODES, f"unsupported response cache mode {mode}"
+		self.mode = mode
+		self.directory = directory
+		self.scope = scope
+
+	def scoped(self, scope: Any) -> "ResponseCache":
+		return ResponseCache(self.mode, self.directory, f"{self.scope}/{scope}" if self.scope else str(scope))
+
+	def _path(self, key: str) -> str:
+		return os.path.join(self.directory, key[:2], f"{key}.json")
+
+	def load(self, key: str) -> Message | None:
+		path = self._path(key)
+		if not os.path.exists(path):
+			return None
+		with open(path) as f:
+			return Message.model_validate_json(f.read())
+
+	def store(self, key: str, response: Message) -> None:
+		path = self._path(key)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		temp_path = f"{path}.{os.getpid()}.tmp"
+		with open(temp_path, "w") as f:
+			f.write(response.model_dump_json())
+		os.replace(temp_path, path)
+
+	async def get_or_create(self, request: dict[str, Any], create: Callable[[], Awaitable[Message]]) -> Message:
+		if self.mode == "passthrough":
+			return await create()
+
+		key = canonical_request_hash(request, self.scope)
+		if self.mode == "replay":
+			response = self.load(key)
+			if response is None:
+				raise ResponseCacheMiss(f"No recorded response for request {key} (scope {self.scope!r}) in {self.directory}")
+			return response
+
+		response = await create()
+		self.store(key, response)
+		return response
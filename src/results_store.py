@@ -0,0 +1,47 @@
+import hashlib
+import json
+import os
+from typing import Any
+
+from .config import RESULTS_DIR
+
+
+def suite_config_hash(suite_config: dict[str, Any]) -> str:
+	encoded = json.dumps(suite_config, sort_keys=True, separators=(",", ":"), default=str).encode()
+	return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class ResultsStore:
+	def __init__(self, suite_key: str, directory: str = RESULTS_DIR) -> None:
+		self.suite_key = suite_key
+		self.path = os.path.join(directory, f"{suite_key}.jsonl")
+		self._terminate_partial_line()
+
+	def _terminate_partial_line(self) -> None:
+		if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+			return
+		with open(self.path, "rb+") as f:
+			f.seek(-1, os.SEEK_END)
+			if f.read(1) != b"\n":
+				f.write(b"\n")
+
+	def completed(self) -> dict[int, dict[str, Any]]:
+		if not os.path.exists(self.path):
+			return {}
+		results = {}
+		with open(self.path) as f:
+			for line in f:
+				try:
+					result = json.loads(line)
+				except json.JSONDecodeError:
+					# A run interrupted mid-write leaves a partial last line
+					continue
+				results[result["run_id"]] = result
+		return results
+
+	def append(self, result: dict[str, Any]) -> None:
+		os.makedirs(os.path.dirname(self.path), exist_ok=True)
+		with open(self.path, "a") as f:
+			f.write(json.dumps(result, default=str) + "\n")
+			f.flush()
+			os.fsync(f.fileno())
@@ -0,0 +1,157 @@
+import asyncio
+import multiprocessing
+import os
+import resource
+import signal
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any
+
+import pandas as pd
+
+from .config import SANDBOX_BACKEND, SANDBOX_TIMEOUT_SECONDS, SANDBOX_CPU_LIMIT_SECONDS, SANDBOX_MEMORY_LIMIT_MB, OUTPUT_ACCOUNTING
+from .environment import SharedDataset
+from .output_accounting import load_sorted_source_values
+from .tools import PythonExpressionToolResult, SandboxSession, create_namespace, execute_expression
+
+
+class CpuLimitExceeded(Exception):
+	pass
+
+
+def _raise_cpu_limit_exceeded(signum: int, frame: Any) -> None:
+	raise CpuLimitExceeded("CPU time limit exceeded while executing the expression. Use vectorized operations or work on smaller subsets.")
+
+
+def _set_cpu_limit(cpu_limit: int | None) -> None:
+	if cpu_limit is None:
+		resource.setrlimit(resource.RLIMIT_CPU, (resource.RLIM_INFINITY, resource.RLIM_INFINITY))
+		return
+	usage = resource.getrusage(resource.RUSAGE_SELF)
+	soft_limit = int(usage.ru_utime + usage.ru_stime) + cpu_limit
+	resource.setrlimit(resource.RLIMIT_CPU, (soft_limit, resource.RLIM_INFINITY))
+
+
+def _worker_main(connection: Connection, dataset: SharedDataset, cpu_limit: int, memory_limit_mb: int) -> None:
+	# The shared dataset is mapped read-only, so its size is added on top of the working-memory cap
+	memory_limit = memory_limit_mb * 1024 * 1024 + os.path.getsize(dataset.data_path)
+	if OUTPUT_ACCOUNTING == "source":
+		# Sorted once before the cap applies, and left out of the expression's budget
+		memory_limit += load_sorted_source_values(dataset).nbytes
+	resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+	signal.signal(signal.SIGXCPU, _raise_cpu_limit_exceeded)
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	# Copy-on-write is process-wide, so it is only switched on inside the worker
+	pd.set_option("mode.copy_on_write", True)
+
+	namespace = create_namespace(dataset)
+	num_cols = len(dataset.columns)
+	while True:
+		try:
+			expression = connection.recv()
+		except EOFError:
+			return
+		_set_cpu_limit(cpu_limit)
+		try:
+			result = execute_expression(namespace, expression, num_cols, dataset)
+		except CpuLimitExceeded as e:
+			result = {"result": None, "error": str(e)}
+		finally:
+			_set_cpu_limit(None)
+		connection.send(result)
+
+
+class ProcessSandboxSession(SandboxSession):
+	def __init__(
+		self,
+		dataset: SharedDataset | None = None,
+		timeout: float = SANDBOX_TIMEOUT_SECONDS,
+		cpu_limit: int = SANDBOX_CPU_LIMIT_SECONDS,
+		memory_limit_mb: int = SANDBOX_MEMORY_LIMIT_MB,
+	) -> None:
+		self.timeout = timeout
+		self.cpu_limit = cpu_limit
+		self.memory_limit_mb = memory_limit_mb
+		self.worker: BaseProcess | None = None
+		self.connection: Connection | None = None
+		super().__init__(dataset)
+
+	def reset(self) -> None:
+		self._stop_worker()
+		self._start_worker()
+
+	def _start_worker(self) -> None:
+		context = multiprocessing.get_context("spawn")
+		self.connection, child_connection = context.Pipe()
+		self.worker = context.Process(
+			target=_worker_main,
+			args=(child_connection, self.dataset, self.cpu_limit, self.memory_limit_mb),
+			daemon=True,
+		)
+		self.worker.start()
+		child_connection.close()
+
+	def _stop_worker(self) -> None:
+		if self.worker is not None:
+			self.worker.kill()
+			self.worker.join()
+			self.worker.close()
+			self.worker = None
+		if self.connection is not None:
+			self.connection.close()
+			self.connection = None
+
+	async def _wait_readable(self) -> bool:
+		loop = asyncio.get_running_loop()
+		readable = loop.create_future()
+		fd = self.connection.fileno()
+		loop.add_reader(fd, lambda: readable.done() or readable.set_result(True))
+		try:
+			return await asyncio.wait_for(readable, self.timeout)
+		except TimeoutError:
+			return False
+		finally:
+			loop.remove_reader(fd)
+
+	async def execute(self, expression: str) -> PythonExpressionToolResult:
+		if self.worker is None or not self.worker.is_alive():
+			self._stop_worker()
+			self._start_worker()
+
+		try:
+			self.connection.send(expression)
+		except OSError:
+			return self._restart_after_crash()
+		try:
+			readable = await self._wait_readable()
+		except asyncio.CancelledError:
+			# An abandoned call must neither keep running nor leave its result for the next call
+			self.reset()
+			raise
+		if not readable:
+			self.reset()
+			return {
+				"result": None,
+				"error": f"Execution timed out after {self.timeout:g}s. The sandbox was restarted and variables from previous steps were lost.",
+			}
+
+		try:
+			return self.connection.recv()
+		except (EOFError, OSError):
+			return self._restart_after_crash()
+
+	def _restart_after_crash(self) -> PythonExpressionToolResult:
+		self.reset()
+		return {
+			"result": None,
+			"error": "The sandbox process was terminated (resource limit exceeded). It was restarted and variables from previous steps were lost.",
+		}
+
+	def close(self) -> None:
+		self._stop_worker()
+
+
+def create_session(dataset: SharedDataset | None = None) -> SandboxSession:
+	if SANDBOX_BACKEND == "process":
+		return ProcessSandboxSession(dataset)
+	return SandboxSession(dataset)
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from anthropic import APIConnectionError, APIError, APIStatusError, AsyncAnthropic
+from anthropic.types import Message
+
+from .config import (
+	REQUESTS_PER_MINUTE, INPUT_TOKENS_PER_MINUTE, OUTPUT_TOKENS_PER_MINUTE,
+	MAX_API_RETRIES, RETRY_BACKOFF_BASE_SECONDS, RETRY_BACKOFF_MAX_SECONDS,
+	DEBUG,
+)
+
+THROTTLE_STATUS_CODES = {429, 529}
+# Same policy as the SDK's own retries, which the shared client turns off: timeouts, lock conflicts, throttling and server errors
+RETRYABLE_STATUS_CODES = {408, 409, *THROTTLE_STATUS_CODES}
+CHARS_PER_TOKEN = 4
+
+
+class TokenBucket:
+	def __init__(self, capacity_per_minute: float) -> None:
+		self.capacity = capacity_per_minute
+		self.refill_rate = capacity_per_minute / 60
+		self.tokens = capacity_per_minute
+		self.updated_at = time.monotonic()
+		self.lock = asyncio.Lock()
+
+	def _refill(self) -> None:
+		now = time.monotonic()
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+		self.updated_at = now
+
+	async def acquire(self, amount: float) -> None:
+		amount = min(amount, self.capacity)
+		async with self.lock:
+			self._refill()
+			while self.tokens < amount:
+				await asyncio.sleep((amount - self.tokens) / self.refill_rate)
+				self._refill()
+			self.tokens -= amount
+
+	def adjust(self, amount: float) -> None:
+		self._refill()
+		self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def estimate_input_tokens(request: dict[str, Any]) -> int:
+	payload = json.dumps([request.get("tools"), request.get("messages")], default=str)
+	return len(payload) // CHARS_PER_TOKEN + 1
+
+
+def is_retryable(error: APIError) -> bool:
+	if isinstance(error, APIConnectionError):
+		return True
+	if not isinstance(error, APIStatusError):
+		return False
+	should_retry = error.response.headers.get("x-should-retry")
+	if should_retry is not None:
+		return should_retry == "true"
+	return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+
+
+def parse_retry_after(error: APIStatusError) -> float | None:
+	headers = error.response.headers
+	if "retry-after-ms" in headers:
+		try:
+			return float(headers["retry-after-ms"]) / 1000
+		except ValueError:
+			pass
+	if "retry-after" in headers:
+		try:
+			return float(headers["retry-after"])
+		except ValueError:
+			pass
+	return None
+
+
+class RequestScheduler:
+	def __init__(
+		self,
+		requests_per_minute: float = REQUESTS_PER_MINUTE,
+		input_tokens_per_minute: float = INPUT_TOKENS_PER_MINUTE,
+		output_tokens_per_minute: float = OUTPUT_TOKENS_PER_MINUTE,
+		max_retries: int = MAX_API_RETRIES,
+		backoff_base: float = RETRY_BACKOFF_BASE_SECONDS,
+		backoff_max: float = RETRY_BACKOFF_MAX_SECONDS,
+	) -> None:
+		self.request_bucket = TokenBucket(requests_per_minute)
+		self.input_token_bucket = TokenBucket(input_tokens_per_minute)
+		self.output_token_bucket = TokenBucket(output_tokens_per_minute)
+		self.max_retries = max_retries
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+		self.paused_until = 0.0
+		self.throttled_count = 0
+		self.failed_count = 0
+
+	def _retry_delay(self, error: APIError, attempt: int) -> float:
+		retry_after = parse_retry_after(error) if isinstance(error, APIStatusError) else None
+		if retry_after is not None:
+			return retry_after + random.uniform(0, self.backoff_base)
+		return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+	async def _wait_while_paused(self) -> None:
+		while (delay := self.paused_until - time.monotonic()) > 0:
+			await asyncio.sleep(delay)
+
+	async def create_message(self, client: AsyncAnthropic, **request: Any) -> Message:
+		return await self.submit(request, lambda: client.messages.create(**request))
+
+	async def submit(self, request: dict[str, Any], call: Callable[[], Awaitable[Message]]) -> Message:
+		input_estimate = estimate_input_tokens(request)
+		output_reservation = request["max_tokens"]
+
+		attempt = 0
+		while True:
+			await self._wait_while_paused()
+			await self.request_bucket.acquire(1)
+			await self.input_token_bucket.acquire(input_estimate)
+			await self.output_token_bucket.acquire(output_reservation)
+
+			try:
+				response = await call()
+			except APIError as e:
+				if not is_retryable(e) or attempt == self.max_retries:
+					raise
+				self.input_token_bucket.adjust(input_estimate)
+				self.output_token_bucket.adjust(output_reservation)
+				delay = self._retry_delay(e, attempt)
+				attempt += 1
+				throttled = isinstance(e, APIStatusError) and e.status_code in THROTTLE_STATUS_CODES
+				if DEBUG:
+					reason = e.status_code if isinstance(e, APIStatusError) else type(e).__name__
+					print(f"[DEBUG] API returned {reason}, retrying in {delay:.2f}s (attempt {attempt}/{self.max_retries})")
+				# Throttling holds back every request; a failed request only backs off itself
+				if throttled:
+					self.throttled_count += 1
+					self.paused_until = max(self.paused_until, time.monotonic() + delay)
+				else:
+					self.failed_count += 1
+					await asyncio.sleep(delay)
+				continue
+
+			self.input_token_bucket.adjust(input_estimate - response.usage.input_tokens)
+			self.output_token_bucket.adjust(output_reservation - response.usage.output_tokens)
+			return response
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from .config import NUM_ROWS, RANDOM_SEED, VECTORIZED_GENERATION, TASK_POOL_SIZE, TASK_POOL_DIR
+from .environment import Environment, SharedDataset, environment_cache_key, load_shared_dataframe
+
+
+class TaskPool:
+	def __init__(self, data_path: str, columns: tuple[str, ...], seeds: list[int], correct_means: list[float], methods_results: list[list[float]]) -> None:
+		self.data_path = data_path
+		self.columns = columns
+		self.seeds = seeds
+		self.correct_means = correct_means
+		self.methods_results = methods_results
+		self._variants: dict[int, Environment] = {}
+
+	def __len__(self) -> int:
+		return len(self.seeds)
+
+	@classmethod
+	def build(cls, path: str, size: int, seed: int = RANDOM_SEED, num_rows: int = NUM_ROWS, vectorized: bool = VECTORIZED_GENERATION) -> None:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		temp_suffix = f".{os.getpid()}.tmp"
+		seeds = [seed + index for index in range(size)]
+		correct_means = []
+		methods_results = []
+		data = None
+
+		for index, variant_seed in enumerate(seeds):
+			environment = Environment.generate(variant_seed, num_rows, vectorized)
+			if data is None:
+				columns = list(environment.df.columns)
+				data = open_memmap(f"{path}.npy{temp_suffix}", mode="w+", dtype=np.float64, shape=(size, *environment.df.shape))
+			data[index] = environment.df.to_numpy()
+			correct_means.append(environment.correct_mean)
+			methods_results.append([float(result) for result in environment.methods_results])
+
+		data.flush()
+		del data
+		os.replace(f"{path}.npy{temp_suffix}", f"{path}.npy")
+
+		metadata = {
+			"columns": columns,
+			"seeds": seeds,
+			"correct_means": correct_means,
+			"methods_results": methods_results,
+		}
+		with open(f"{path}.json{temp_suffix}", "w") as f:
+			json.dump(metadata, f)
+		os.replace(f"{path}.json{temp_suffix}", f"{path}.json")
+
+	@classmethod
+	def load(cls, path: str) -> "TaskPool":
+		with open(f"{path}.json") as f:
+			metadata = json.load(f)
+		return cls(f"{path}.npy", tuple(metadata["columns"]), metadata["seeds"], metadata["correct_means"], metadata["methods_results"])
+
+	def checkout(self, index: int) -> Environment:
+		index %= len(self)
+		if index not in self._variants:
+			dataset = SharedDataset(self.data_path, self.columns, index)
+			self._variants[index] = Environment(load_shared_dataframe(dataset), self.correct_means[index], self.methods_results[index], dataset)
+		return self._variants[index]
+
+
+def task_pool_cache_key(size: int, seed: int = RANDOM_SEED, num_rows: int = NUM_ROWS, vectorized: bool = VECTORIZED_GENERATION) -> str:
+	encoded = f"{environment_cache_key(seed, num_rows, vectorized)}:{size}".encode()
+	return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+_task_pools: dict[str, TaskPool] = {}
+
+
+def get_task_pool(size: int = TASK_POOL_SIZE, seed: int = RANDOM_SEED, num_rows: int = NUM_ROWS, vectorized: bool = VECTORIZED_GENERATION) -> TaskPool:
+	key = task_pool_cache_key(size, seed, num_rows, vectorized)
+	if key in _task_pools:
+		return _task_pools[key]
+
+	path = os.path.join(TASK_POOL_DIR, key)
+	if not os.path.exists(f"{path}.json"):
+		TaskPool.build(path, size, seed, num_rows, vectorized)
+
+	task_pool = TaskPool.load(path)
+	_task_pools[key] = task_pool
+	return task_pool
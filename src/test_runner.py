@@ -1,114 +1,283 @@
 import asyncio
+from collections.abc import Callable
+from typing import Any
 
 from anthropic.types import ToolUnionParam
 
-from .evaluator import run_single_test
+from . import config
+from .agent import ModelBackend, create_client
+from .evaluator import TestRunResult, run_single_test
+from .response_cache import ResponseCache
+from .scheduler import RequestScheduler
 from .tools import python_expression_tool, submit_answer_tool
-from .config import DEBUG, NUM_RUNS, EXPECTED_ANSWER, ANSWER_TOLERANCE, create_prompt, TEST_MAX_STEPS, TEST_VERBOSE
-
-
-async def run_test_suite(concurrent: bool = False):
-	assert not concurrent # 1. This caused rate limiting issues. 2. We persist state and this would interfere.
-	# Opting not to solve the concurrency issues and instead disallow it.
-	tools: list[ToolUnionParam] = [
-		{
-			"name": "python_expression",
-			"description": "Evaluates a Python expression",
-			"input_schema": {
-				"type": "object",
-				"properties": {
-					"expression": {
-						"type": "string",
-						"description": "Will be passed to exec(). Use print() to output something. Returns stdout. ",
-					}
-				},
-				"required": ["expression"],
+from .config import (
+	DEBUG, NUM_RUNS, MAX_CONCURRENT_RUNS, TASK_POOL_SIZE, PROMPT_CACHING, TRACING, create_prompt, TEST_MAX_STEPS, TEST_VERBOSE,
+	DEFAULT_MODEL, MAX_TOKENS, RECORD_RESULTS, RESUME_RESULTS, ADAPTIVE_STOPPING,
+	OUT_OF_CORE,
+)
+from .early_stopping import EarlyStopping
+from .out_of_core import get_out_of_core_environment, out_of_core_cache_key
+from .environment import environment_cache_key, get_environment
+from .results_store import ResultsStore, suite_config_hash
+from .task_pool import get_task_pool, task_pool_cache_key
+from .tracing import Tracer
+
+
+TOOLS: list[ToolUnionParam] = [
+	{
+		"name": "python_expression",
+		"description": "Evaluates a Python expression",
+		"input_schema": {
+			"type": "object",
+			"properties": {
+				"expression": {
+					"type": "string",
+					"description": "Will be passed to exec(). Use print() to output something. Returns stdout. ",
+				}
 			},
+			"required": ["expression"],
 		},
-		{
-			"name": "submit_answer",
-			"description": "Submit the final answer",
-			"input_schema": {
-				"type": "object",
-				"properties": {"answer": {"description": "The final answer to submit"}},
-				"required": ["answer"],
-			},
+	},
+	{
+		"name": "submit_answer",
+		"description": "Submit the final answer",
+		"input_schema": {
+			"type": "object",
+			"properties": {"answer": {"description": "The final answer to submit"}},
+			"required": ["answer"],
 		},
-	]
+	},
+]
+
+
+# Settings that change how runs behave or are graded, hashed into the results-store key
+RUN_CONFIG_NAMES = [
+	'TOLERANCE_MULTIPLIER',
+	'HISTORY_COMPACTION', 'HISTORY_TOOL_RESULT_TOKEN_BUDGET', 'HISTORY_TRUNCATED_RESULT_CHARS',
+	'STREAMING', 'CONCURRENT_TOOL_CALLS',
+	'SANDBOX_BACKEND', 'SANDBOX_TIMEOUT_SECONDS', 'SANDBOX_CPU_LIMIT_SECONDS', 'SANDBOX_MEMORY_LIMIT_MB',
+	'OUTPUT_MAX_CHARS', 'OUTPUT_ABORT_MULTIPLIER', 'OUTPUT_INTERRUPT_ON_LIMIT', 'OUTPUT_ACCOUNTING',
+]
+
+
+def backend_config(backend: ModelBackend | None) -> dict[str, Any]:
+	if backend is None:
+		return {"type": "AnthropicBackend"}
+	# Scalar attributes such as a scripted policy or latency change what the backend returns
+	settings = {name: value for name, value in vars(backend).items() if isinstance(value, (str, int, float, bool))}
+	return {"type": type(backend).__name__, **settings}
+
+
+def suite_key(
+	prompt: str,
+	task_key: str,
+	backend: ModelBackend | None,
+	model: str = DEFAULT_MODEL,
+	max_tokens: int = MAX_TOKENS,
+	max_steps: int = TEST_MAX_STEPS,
+	tools: list[ToolUnionParam] = TOOLS,
+) -> str:
+	return suite_config_hash({
+		"model": model,
+		"max_tokens": max_tokens,
+		"max_steps": max_steps,
+		"prompt": prompt,
+		"tools": tools,
+		"task": task_key,
+		"backend": backend_config(backend),
+		"config": {name: getattr(config, name) for name in RUN_CONFIG_NAMES},
+	})
+
 
-	tool_handlers = {
-		"python_expression": python_expression_tool,
-		"submit_answer": submit_answer_tool,
-	}
+async def run_test_suite(
+	concurrent: bool = False,
+	num_runs: int = NUM_RUNS,
+	max_concurrent_runs: int = MAX_CONCURRENT_RUNS,
+	backend: ModelBackend | None = None,
+	tool_handlers: dict[str, Callable[..., Any]] | None = None,
+	task_pool_size: int = TASK_POOL_SIZE,
+	record_results: bool = RECORD_RESULTS,
+	resume: bool = RESUME_RESULTS,
+	adaptive: bool = ADAPTIVE_STOPPING,
+	model: str = DEFAULT_MODEL,
+	max_steps: int = TEST_MAX_STEPS,
+	max_tokens: int = MAX_TOKENS,
+) -> list[TestRunResult]:
+	tools = TOOLS
+
+	if tool_handlers is None:
+		tool_handlers = {
+			"python_expression": python_expression_tool,
+			"submit_answer": submit_answer_tool,
+		}
 
 	# Run the test and track success rate
-	num_runs = NUM_RUNS
-	expected_answer = EXPECTED_ANSWER
-	prompt = create_prompt(TEST_MAX_STEPS)
+	if task_pool_size:
+		task_pool = get_task_pool(task_pool_size)
+		environments = [task_pool.checkout(i) for i in range(num_runs)]
+	elif OUT_OF_CORE:
+		environments = [get_out_of_core_environment()] * num_runs
+	else:
+		environments = [get_environment()] * num_runs
+	expected_answer = environments[0].CORRECT_MEAN
+	answer_tolerance = environments[0].TOLERANCE_ABSOLUTE
+	prompt = create_prompt(max_steps)
+	scheduler = RequestScheduler()
+	response_cache = ResponseCache()
+	tracer = Tracer() if TRACING else None
+
+	task_key = task_pool_cache_key(task_pool_size) if task_pool_size else out_of_core_cache_key() if OUT_OF_CORE else environment_cache_key()
+	results_key = suite_key(prompt, task_key, backend, model, max_tokens, max_steps, tools)
+	results_store = ResultsStore(results_key) if record_results or resume else None
+	completed = results_store.completed() if resume else {}
+	results = [completed[run_id] for run_id in sorted(completed) if run_id <= num_runs]
+
+	early_stopping = EarlyStopping() if adaptive else None
+	stopped = False
+	if early_stopping is not None:
+		for result in results:
+			stopped = early_stopping.update(result["success"])
 
 	if DEBUG:
 		print(f"[DEBUG] Test suite configuration:")
 		print(f"[DEBUG] - Number of runs: {num_runs}")
 		print(f"[DEBUG] - Expected answer: {expected_answer}")
-		print(f"[DEBUG] - Tolerance: {ANSWER_TOLERANCE}")
+		print(f"[DEBUG] - Tolerance: {answer_tolerance}")
+		print(f"[DEBUG] - Task pool size: {task_pool_size or 'disabled'}")
 		print(f"[DEBUG] - Concurrent execution: {concurrent}")
+		print(f"[DEBUG] - Max concurrent runs: {max_concurrent_runs}")
+		print(f"[DEBUG] - Response cache mode: {response_cache.mode}")
+		print(f"[DEBUG] - Prompt caching: {PROMPT_CACHING}")
+		print(f"[DEBUG] - Model: {model}, max steps: {max_steps}, max tokens: {max_tokens}")
+		print(f"[DEBUG] - Suite configuration hash: {results_key}")
+		if early_stopping is not None:
+			print(f"[DEBUG] - Adaptive stopping: band {early_stopping.band}, confidence {early_stopping.confidence}, at least {early_stopping.min_runs} runs")
 		print(f"[DEBUG] - Prompt: {prompt}")
 
 	execution_mode = "concurrently" if concurrent else "sequentially"
 	print(f"Running {num_runs} test iterations {execution_mode}...")
+	if completed:
+		print(f"Resuming suite {results_key}: {len(completed)} runs already recorded in {results_store.path}")
 	print("=" * 60)
 
-	# Create all test coroutines
-	tasks = [
-		run_single_test(
-			run_id=i + 1,
-			num_runs=num_runs,
-			prompt=prompt,
-			tools=tools,
-			tool_handlers=tool_handlers,
-			expected_answer=expected_answer,
-			tolerance=ANSWER_TOLERANCE,
-			verbose=TEST_VERBOSE,
-		)
-		for i in range(num_runs)
-	]
-
-	# Run concurrently or sequentially based on the flag
-	if concurrent:
-		if DEBUG:
-			print(f"[DEBUG] Running {len(tasks)} tasks concurrently")
-		# Process results as they complete
-		results = []
-		for coro in asyncio.as_completed(tasks):
-			result = await coro
-			results.append(result)
+	resumed_runs = len(results)
+	cancelled_runs = 0
+	async with create_client() as client:
+		# Create all test coroutines
+		tasks = [
+			run_single_test(
+				run_id=i + 1,
+				num_runs=num_runs,
+				prompt=prompt,
+				tools=tools,
+				tool_handlers=tool_handlers,
+				expected_answer=environment.CORRECT_MEAN,
+				tolerance=environment.TOLERANCE_ABSOLUTE,
+				verbose=TEST_VERBOSE,
+				scheduler=scheduler,
+				client=client,
+				response_cache=response_cache,
+				backend=backend,
+				dataset=environment.dataset,
+				tracer=tracer,
+				model=model,
+				max_steps=max_steps,
+				max_tokens=max_tokens,
+			)
+			for i, environment in enumerate(environments)
+			if i + 1 not in completed and not stopped
+		]
+
+		# Run concurrently or sequentially based on the flag
+		if concurrent:
 			if DEBUG:
-				print(f"[DEBUG] Completed task {result[0]}, success: {result[1]}")
-	else:
-		if DEBUG:
-			print(f"[DEBUG] Running {len(tasks)} tasks sequentially")
-		# Run sequentially by awaiting each task in order
-		results = []
-		for task in tasks:
-			result = await task
-			results.append(result)
+				print(f"[DEBUG] Running {len(tasks)} tasks concurrently")
+			semaphore = asyncio.Semaphore(max_concurrent_runs)
+			started_runs = 0
+
+			async def run_bounded(task):
+				nonlocal started_runs
+				try:
+					async with semaphore:
+						started_runs += 1
+						return await task
+				finally:
+					# Runs cancelled before they started were never awaited
+					task.close()
+
+			# Process results as they complete
+			running = [asyncio.ensure_future(run_bounded(task)) for task in tasks]
+			for coro in asyncio.as_completed(running):
+				result = await coro
+				results.append(result)
+				if results_store is not None:
+					results_store.append(result)
+				if DEBUG:
+					print(f"[DEBUG] Completed task {result['run_id']}, success: {result['success']}")
+				if early_stopping is not None and early_stopping.update(result["success"]):
+					break
+
+			# Cancel the runs still in flight once the stopping rule has fired
+			for future in running:
+				future.cancel()
+			await asyncio.gather(*running, return_exceptions=True)
+			cancelled_runs = started_runs - (len(results) - resumed_runs)
+		else:
 			if DEBUG:
-				print(f"[DEBUG] Completed task {result[0]}, success: {result[1]}")
+				print(f"[DEBUG] Running {len(tasks)} tasks sequentially")
+			# Run sequentially by awaiting each task in order
+			for task in tasks:
+				if stopped:
+					task.close()
+					continue
+				result = await task
+				results.append(result)
+				if results_store is not None:
+					results_store.append(result)
+				if DEBUG:
+					print(f"[DEBUG] Completed task {result['run_id']}, success: {result['success']}")
+				stopped = early_stopping is not None and early_stopping.update(result["success"])
 
 	# Count successes
-	successes = sum(1 for _, success, _ in results if success)
+	successes = sum(1 for result in results if result["success"])
 	
 	if DEBUG:
 		print(f"[DEBUG] Final results summary:")
-		for run_id, success, result in results:
-			print(f"[DEBUG] - Run {run_id}: {'SUCCESS' if success else 'FAILURE'} (result: {result})")
+		for result in results:
+			print(f"[DEBUG] - Run {result['run_id']}: {'SUCCESS' if result['success'] else 'FAILURE'} (result: {result['result']})")
+			if PROMPT_CACHING:
+				print(f"[DEBUG]   prompt cache: {result['cache_hits']} hits, {result['cache_misses']} misses, {result['cache_read_tokens']} tokens read, {result['cache_creation_tokens']} tokens written")
 
 	# Calculate and display pass rate
-	pass_rate = (successes / num_runs) * 100
+	completed_runs = len(results)
+	pass_rate = (successes / completed_runs) * 100 if completed_runs else 0.0
 	print(f"\n{'=' * 60}")
 	print("Test Results:")
-	print(f"  Passed: {successes}/{num_runs}")
-	print(f"  Failed: {num_runs - successes}/{num_runs}")
+	print(f"  Passed: {successes}/{completed_runs}")
+	print(f"  Failed: {completed_runs - successes}/{completed_runs}")
 	print(f"  Pass Rate: {pass_rate:.1f}%")
+	if early_stopping is not None:
+		lower, upper = early_stopping.interval
+		band_lower, band_upper = early_stopping.band
+		outcome = f"{early_stopping.decision} the target band" if early_stopping.decision else "undecided (budget exhausted)"
+		print(f"  {early_stopping.confidence:.0%} Wilson interval: [{lower:.1%}, {upper:.1%}] vs band [{band_lower:.0%}, {band_upper:.0%}] -> {outcome}")
+		print(f"  Runs never started: {num_runs - completed_runs - cancelled_runs}/{num_runs}")
+		if cancelled_runs:
+			print(f"  Runs cancelled in flight: {cancelled_runs}/{num_runs}")
+	if PROMPT_CACHING:
+		cache_hits = sum(result["cache_hits"] for result in results)
+		cache_calls = cache_hits + sum(result["cache_misses"] for result in results)
+		cache_read_tokens = sum(result["cache_read_tokens"] for result in results)
+		cache_creation_tokens = sum(result["cache_creation_tokens"] for result in results)
+		print(f"  Prompt cache hits: {cache_hits}/{cache_calls} calls ({cache_read_tokens} tokens read, {cache_creation_tokens} tokens written)")
+	if scheduler.throttled_count:
+		print(f"  Throttled API calls retried: {scheduler.throttled_count}")
+	if scheduler.failed_count:
+		print(f"  Failed API calls retried: {scheduler.failed_count}")
+	if tracer is not None:
+		tracer.print_summary()
+		tracer.close()
 	print(f"{'=' * 60}")
 
+	return results
+
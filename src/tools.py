@@ -1,16 +1,24 @@
+import asyncio
 from contextlib import redirect_stdout
-from io import StringIO
-from typing import Any, TypedDict
+from io import TextIOBase
+from typing import Any, NotRequired, TypedDict
 import re
 import pandas as pd
 import numpy as np
 import scipy
-from .environment import df
+from .config import OUTPUT_MAX_CHARS, OUTPUT_ABORT_MULTIPLIER, OUTPUT_INTERRUPT_ON_LIMIT, OUTPUT_ACCOUNTING, PROFILE_EXPRESSIONS
+from .environment import SharedDataset, get_environment, load_shared_dataframe
+from .output_accounting import SourceValueCounter, ValueCounter
+from .profiling import ExpressionProfile, ExpressionProfiler
+
+NUMERIC_PATTERN = re.compile(r'[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?')
 
 
 class PythonExpressionToolResult(TypedDict):
 	result: Any
 	error: str | None
+	# Trace-only; removed before the result is shown to the model
+	profile: NotRequired[ExpressionProfile]
 
 
 class SubmitAnswerToolResult(TypedDict):
@@ -18,19 +26,36 @@ class SubmitAnswerToolResult(TypedDict):
 	submitted: bool
 
 
-_persistent_namespace: dict[str, Any] = {}
-
-
-def reset_namespace() -> None:
-	global _persistent_namespace
-	_persistent_namespace = {
+def create_namespace(dataset: SharedDataset) -> dict[str, Any]:
+	return {
 		'pd': pd,
 		'np': np,
 		'scipy': scipy,
-		'df': df,
+		# Callers enable copy-on-write, so edits copy only the blocks they touch instead of writing into the shared mapping
+		'df': load_shared_dataframe(dataset).copy(deep=False),
 	}
 
 
+class SandboxSession:
+	def __init__(self, dataset: SharedDataset | None = None) -> None:
+		self.dataset = dataset if dataset is not None else get_environment().dataset
+		self.namespace: dict[str, Any] = {}
+		self.lock = asyncio.Lock()
+		self.reset()
+
+	# Copy-on-write is process-wide, so the inline session only switches it on around its own code
+	def reset(self) -> None:
+		with pd.option_context("mode.copy_on_write", True):
+			self.namespace = create_namespace(self.dataset)
+
+	async def execute(self, expression: str) -> PythonExpressionToolResult:
+		with pd.option_context("mode.copy_on_write", True):
+			return execute_expression(self.namespace, expression, len(self.dataset.columns), self.dataset)
+
+	def close(self) -> None:
+		pass
+
+
 def is_allowed_summary_output(output: str) -> bool:
 	output_lower = output.lower()
 	
@@ -52,38 +77,150 @@ def is_allowed_summary_output(output: str) -> bool:
 	return False
 
 
-def count_df_values_in_output(output: str, num_cols: int) -> int:	
-	lines = output.strip().split('\n')
-	
-	if not lines:
-		return 0
-	
-	value_count = 0
-	in_dataframe = False
-	
-	for line in lines:
-		if 'feature_' in line or (line.strip() and len(line.strip()) > 0 and line.strip()[0].isdigit() and '  ' in line):
-			in_dataframe = True
+class DataFrameValueCounter:
+	def __init__(self, num_cols: int) -> None:
+		self.num_cols = num_cols
+		self.value_count = 0
+		self.in_dataframe = False
+
+	def feed_line(self, line: str) -> None:
+		stripped = line.strip()
+		if 'feature_' in line or (stripped and stripped[0].isdigit() and '  ' in line):
+			self.in_dataframe = True
 		
-		if in_dataframe and line.strip():
-			numeric_pattern = r'[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?'
-			numbers = re.findall(numeric_pattern, line)
-			
-			if len(numbers) >= num_cols:
-				value_count += num_cols
-	
-	return value_count
+		if self.in_dataframe and stripped:
+			if len(NUMERIC_PATTERN.findall(line)) >= self.num_cols:
+				self.value_count += self.num_cols
 
 
-def python_expression_tool(expression: str) -> PythonExpressionToolResult:
-	"""
-	Tool that evaluates Python expressions using exec.
-	Use print(...) to emit output; stdout will be captured and returned.
-	You have access to pandas as 'pd', numpy as 'np', scipy as scipy, and the dataframe as 'df'.
-	Variables defined in previous steps persist across steps.
-	"""
-	global _persistent_namespace
-	
+def count_df_values_in_output(output: str, num_cols: int) -> int:
+	counter = DataFrameValueCounter(num_cols)
+	for line in output.strip().split('\n'):
+		counter.feed_line(line)
+	return counter.value_count
+
+
+OUTPUT_LIMIT_ERROR = "Output limit exceeded"
+
+
+def is_output_limit_error(result: PythonExpressionToolResult) -> bool:
+	return bool(result["error"]) and result["error"].startswith(OUTPUT_LIMIT_ERROR)
+
+
+class OutputLimitExceeded(BaseException):
+	pass
+
+
+class BoundedOutputSink(TextIOBase):
+	def __init__(
+		self,
+		num_cols: int,
+		max_chars: int = OUTPUT_MAX_CHARS,
+		abort_multiplier: int = OUTPUT_ABORT_MULTIPLIER,
+		interrupt: bool = OUTPUT_INTERRUPT_ON_LIMIT,
+		counter: ValueCounter | None = None,
+	) -> None:
+		self.counter = counter if counter is not None else DataFrameValueCounter(num_cols)
+		self.max_chars = max_chars
+		self.abort_value_count = abort_multiplier * 2 * num_cols
+		self.interrupt = interrupt
+		self.chunks: list[str] = []
+		self.captured_chars = 0
+		self.dropped_chars = 0
+		# The unfinished line is kept in pieces and only joined once it ends, so writes without newlines stay O(1)
+		self.pending_parts: list[str] = []
+		self.pending_chars = 0
+		self.started = False
+		self.aborted = False
+
+	@property
+	def value_count(self) -> int:
+		return self.counter.value_count
+
+	def writable(self) -> bool:
+		return True
+
+	def write(self, text: str) -> int:
+		if self.aborted:
+			if self.interrupt:
+				raise OutputLimitExceeded()
+			return len(text)
+		
+		self._capture(text)
+		self._count(text)
+		
+		if self.counter.value_count > self.abort_value_count:
+			self.aborted = True
+			if self.interrupt:
+				raise OutputLimitExceeded()
+		return len(text)
+
+	def finish(self) -> None:
+		if not self.aborted and self.pending_parts:
+			self.counter.feed_line(''.join(self.pending_parts))
+		self.pending_parts = []
+		self.pending_chars = 0
+
+	def getvalue(self) -> str:
+		output = ''.join(self.chunks)
+		if self.dropped_chars:
+			output += f"\n[Output truncated: {self.dropped_chars} more characters were not captured]"
+		return output
+
+	def _capture(self, text: str) -> None:
+		remaining = max(0, self.max_chars - self.captured_chars)
+		if remaining:
+			self.chunks.append(text[:remaining])
+			self.captured_chars += min(len(text), remaining)
+		self.dropped_chars += max(0, len(text) - remaining)
+
+	def _count(self, text: str) -> None:
+		if not self.started:
+			text = text.lstrip()
+			if not text:
+				return
+			self.started = True
+		
+		if '\n' in text:
+			first_line, *lines, last_line = text.split('\n')
+			self.counter.feed_line(''.join(self.pending_parts) + first_line)
+			for line in lines:
+				self.counter.feed_line(line)
+			self.pending_parts = []
+			self.pending_chars = 0
+			text = last_line
+		if text:
+			self.pending_parts.append(text)
+			self.pending_chars += len(text)
+		if self.pending_chars > self.max_chars:
+			self.counter.feed_line(''.join(self.pending_parts))
+			self.pending_parts = []
+			self.pending_chars = 0
+
+
+def execute_expression(
+	namespace: dict[str, Any],
+	expression: str,
+	num_cols: int,
+	dataset: SharedDataset | None = None,
+	accounting: str = OUTPUT_ACCOUNTING,
+	profiling: bool = PROFILE_EXPRESSIONS,
+) -> PythonExpressionToolResult:
+	if not profiling:
+		return _execute_expression(namespace, expression, num_cols, dataset, accounting)
+	profiler = ExpressionProfiler()
+	with profiler:
+		result = _execute_expression(namespace, expression, num_cols, dataset, accounting)
+	return {**result, "profile": profiler.summary()}
+
+
+def _execute_expression(
+	namespace: dict[str, Any],
+	expression: str,
+	num_cols: int,
+	dataset: SharedDataset | None,
+	accounting: str,
+) -> PythonExpressionToolResult:
 	try:
 		if '#' in expression:
 			return {
@@ -91,32 +228,48 @@ def python_expression_tool(expression: str) -> PythonExpressionToolResult:
 				"error": "Comments are not allowed in Python code. Remove all # comments from your code."
 			}
 		
-		if not _persistent_namespace:
-			reset_namespace()
-		
-		stdout = StringIO()
-		with redirect_stdout(stdout):
-			exec(expression, _persistent_namespace, _persistent_namespace)
+		counter = SourceValueCounter(dataset, DataFrameValueCounter(num_cols)) if accounting == "source" and dataset is not None else None
+		stdout = BoundedOutputSink(num_cols, counter=counter)
+		try:
+			with redirect_stdout(stdout):
+				exec(expression, namespace, namespace)
+		except OutputLimitExceeded:
+			pass
+		stdout.finish()
 		
 		output = stdout.getvalue()
-		num_cols = len(df.columns)
 		max_allowed_values = 2 * num_cols
 		
-		value_count = count_df_values_in_output(output, num_cols)
+		value_count = stdout.value_count
 		
-		if not is_allowed_summary_output(output) and value_count > max_allowed_values:
+		# Source matches are not fooled by keywords in the text, so the summary whitelist only applies to regex accounting
+		over_limit = value_count > max_allowed_values and (accounting != "regex" or not is_allowed_summary_output(output))
+		if stdout.aborted or over_limit:
 			return {
 				"result": None,
-				"error": f"Output limit exceeded: {value_count} dataframe values output, but maximum allowed is {max_allowed_values} (2 * {num_cols} columns). Use more targeted queries like df.shape, df.dtypes, summary statistics, or small samples."
+				"error": f"{OUTPUT_LIMIT_ERROR}: {value_count} dataframe values output, but maximum allowed is {max_allowed_values} (2 * {num_cols} columns). Use more targeted queries like df.shape, df.dtypes, summary statistics, or small samples."
 			}
 		
 		return {"result": output, "error": None}
 	except KeyboardInterrupt:
 		raise
+	except MemoryError:
+		return {"result": None, "error": "Memory limit exceeded while executing the expression. Work on smaller subsets or aggregate instead of copying the dataframe."}
 	except Exception as e:
 		return {"result": None, "error": str(e)}
 
 
+async def python_expression_tool(expression: str, session: SandboxSession) -> PythonExpressionToolResult:
+	"""
+	Tool that evaluates Python expressions using exec.
+	Use print(...) to emit output; stdout will be captured and returned.
+	You have access to pandas as 'pd', numpy as 'np', scipy as scipy, and the dataframe as 'df'.
+	Variables defined in previous steps persist across steps.
+	"""
+	async with session.lock:
+		return await session.execute(expression)
+
+
 def submit_answer_tool(answer: Any) -> SubmitAnswerToolResult:
 	"""
 	Tool for submitting the final answer.
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, TextIO
+
+import numpy as np
+
+from .config import TRACE_DIR
+
+PERCENTILES = (50, 95, 99)
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+SUMMARY_TOP_ENTRIES = 10
+
+
+class Tracer:
+	def __init__(self, path: str | None = None) -> None:
+		self.path = path if path is not None else os.path.join(TRACE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl")
+		self.events: list[dict[str, Any]] = []
+		self.file: TextIO | None = None
+
+	def emit(self, run_id: Any, event: str, **fields: Any) -> None:
+		record = {"time": time.time(), "run_id": run_id, "event": event, **fields}
+		self.events.append(record)
+		if self.file is None:
+			os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+			self.file = open(self.path, "a")
+		self.file.write(json.dumps(record, default=str) + "\n")
+		self.file.flush()
+
+	def scoped(self, run_id: Any) -> "RunTracer":
+		return RunTracer(self, run_id)
+
+	def close(self) -> None:
+		if self.file is not None:
+			self.file.close()
+			self.file = None
+
+	def print_summary(self) -> None:
+		print_trace_summary(self.events)
+		print(f"  Trace written to {self.path}")
+
+
+class RunTracer:
+	def __init__(self, tracer: Tracer, run_id: Any) -> None:
+		self.tracer = tracer
+		self.run_id = run_id
+
+	def emit(self, event: str, **fields: Any) -> None:
+		self.tracer.emit(self.run_id, event, **fields)
+
+
+def stage_name(event: dict[str, Any]) -> str:
+	if event["event"] == "tool_call":
+		return f"tool_call:{event['tool']}"
+	return event["event"]
+
+
+def load_trace(path: str) -> list[dict[str, Any]]:
+	with open(path) as f:
+		return [json.loads(line) for line in f if line.strip()]
+
+
+def print_trace_summary(events: list[dict[str, Any]]) -> None:
+	durations: dict[str, list[float]] = defaultdict(list)
+	tokens: dict[str, int] = defaultdict(int)
+	guard_rejections = 0
+	grades = [event for event in events if event["event"] == "run_result"]
+
+	for event in events:
+		if "duration" in event:
+			durations[stage_name(event)].append(event["duration"])
+		if event.get("time_to_first_token") is not None:
+			durations["time_to_first_token"].append(event["time_to_first_token"])
+		if event["event"] == "model_call":
+			for field in TOKEN_FIELDS:
+				tokens[field] += event.get(field) or 0
+		guard_rejections += bool(event.get("guard_rejected"))
+
+	print(f"Trace summary ({len(events)} events), p{PERCENTILES[0]} / p{PERCENTILES[1]} / p{PERCENTILES[2]} in ms:")
+	for stage, values in sorted(durations.items()):
+		stage_percentiles = " / ".join(f"{value:10.1f}" for value in np.percentile(values, PERCENTILES) * 1000)
+		print(f"  {stage:<28} n={len(values):<6} {stage_percentiles}  total={sum(values):8.2f}s")
+	print("  Tokens: " + ", ".join(f"{field}={tokens[field]}" for field in TOKEN_FIELDS))
+	print(f"  Output guard rejections: {guard_rejections}")
+	if grades:
+		print(f"  Graded runs: {sum(1 for event in grades if event['success'])}/{len(grades)} passed")
+
+	profiled = [event for event in events if event.get("profile") is not None]
+	if profiled:
+		print_profile_summary(profiled)
+
+
+def print_profile_summary(profiled: list[dict[str, Any]]) -> None:
+	profiles = [event["profile"] for event in profiled]
+	print(f"Expression profiles ({len(profiles)} expressions), p{PERCENTILES[0]} / p{PERCENTILES[1]} / p{PERCENTILES[2]}:")
+	for label, values, scale, unit in (
+		("wall time", [profile["wall_time"] for profile in profiles], 1000, "ms"),
+		("cpu time", [profile["cpu_time"] for profile in profiles], 1000, "ms"),
+		("peak memory", [profile["peak_memory_bytes"] for profile in profiles], 1 / 2**20, "MiB"),
+	):
+		stage_percentiles = " / ".join(f"{value:10.1f}" for value in np.percentile(values, PERCENTILES) * scale)
+		print(f"  {label:<28} {stage_percentiles} {unit}  max={max(values) * scale:.1f} {unit}")
+
+	# Self time of each function summed over every expression it was a hotspot of
+	hotspot_times: dict[str, float] = defaultdict(float)
+	hotspot_counts: dict[str, int] = defaultdict(int)
+	for profile in profiles:
+		for hotspot in profile["hotspots"]:
+			hotspot_times[hotspot["function"]] += hotspot["total_time"]
+			hotspot_counts[hotspot["function"]] += 1
+	print("  Top hotspots (self time summed across expressions):")
+	for function, total_time in sorted(hotspot_times.items(), key=lambda item: item[1], reverse=True)[:SUMMARY_TOP_ENTRIES]:
+		print(f"    {total_time * 1000:10.1f} ms  in {hotspot_counts[function]:<5} expressions  {function}")
+
+	print("  Slowest expressions:")
+	for event in sorted(profiled, key=lambda event: event["profile"]["wall_time"], reverse=True)[:SUMMARY_TOP_ENTRIES]:
+		expression = " ".join(event.get("expression", "").split())
+		if len(expression) > 80:
+			expression = expression[:77] + "..."
+		profile = event["profile"]
+		print(f"    {profile['wall_time'] * 1000:10.1f} ms  {profile['peak_memory_bytes'] / 2**20:8.1f} MiB  run {event['run_id']}  {expression}")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("path")
+	args = parser.parse_args()
+
+	print_trace_summary(load_trace(args.path))
@@ -0,0 +1,19 @@
+import pytest
+
+from src.calibration import calibrate_shard, calibration_seeds, tolerance_percents
+from src.config import NUM_ROWS, RANDOM_SEED, TOLERANCE_MULTIPLIER, VECTORIZED_GENERATION
+from src.environment import Environment
+
+
+def test_calibration_seeds_are_consecutive_integers():
+	assert calibration_seeds(3, first_seed=RANDOM_SEED) == [RANDOM_SEED, RANDOM_SEED + 1, RANDOM_SEED + 2]
+
+
+def test_calibrated_seeds_reproduce_their_environment():
+	seeds = calibration_seeds(4, first_seed=117)
+	errors, correct_means = calibrate_shard(seeds, NUM_ROWS, VECTORIZED_GENERATION, batch_size=2)
+
+	for seed, tolerance, correct_mean in zip(seeds, tolerance_percents(errors, TOLERANCE_MULTIPLIER), correct_means):
+		environment = Environment.generate(seed, NUM_ROWS, VECTORIZED_GENERATION)
+		assert environment.CORRECT_MEAN == pytest.approx(correct_mean, rel=1e-12)
+		assert environment.TOLERANCE_PERCENT == pytest.approx(tolerance, rel=1e-9)
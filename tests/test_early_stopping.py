@@ -0,0 +1,39 @@
+import pytest
+
+from src.early_stopping import EarlyStopping, wilson_interval
+
+
+@pytest.mark.parametrize("successes, trials, expected", [
+	(5, 10, (0.2366, 0.7634)),
+	(0, 10, (0.0, 0.2775)),
+	(10, 10, (0.7225, 1.0)),
+	(1, 20, (0.0089, 0.2361)),
+])
+def test_wilson_interval_matches_reference_values(successes, trials, expected):
+	assert wilson_interval(successes, trials, 0.95) == pytest.approx(expected, abs=1e-4)
+
+
+def test_wilson_interval_without_trials_is_uninformative():
+	assert wilson_interval(0, 0) == (0.0, 1.0)
+
+
+def test_wilson_interval_narrows_with_more_trials():
+	lower, upper = wilson_interval(25, 100, 0.95)
+	small_lower, small_upper = wilson_interval(5, 20, 0.95)
+	assert small_lower < lower < 0.25 < upper < small_upper
+
+
+def test_early_stopping_waits_for_min_runs_and_decides_outside():
+	early_stopping = EarlyStopping(band=(0.10, 0.40), confidence=0.95, min_runs=5)
+
+	assert [early_stopping.update(True) for _ in range(4)] == [False] * 4
+	assert early_stopping.update(True)
+	assert early_stopping.decision == "outside"
+	assert early_stopping.trials == 5
+
+
+def test_early_stopping_stays_undecided_near_the_band_edge():
+	early_stopping = EarlyStopping(band=(0.10, 0.40), confidence=0.95, min_runs=5)
+	for success in [True, False, False, True, False, False, False, True, False, False]:
+		assert not early_stopping.update(success)
+	assert early_stopping.decision is None
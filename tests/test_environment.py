@@ -0,0 +1,51 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from src.environment import DataGenerator, DataProcessor, FusedDataProcessor, fused_robust_means
+
+# Frame produced by the original per-row generator for the default seed and size
+BASELINE_FRAME_SHA256 = "d54adf0ca4b8f4dcaf7f7a8ddab8c0e64a8ad4a3aef3e3c94088a7ab341c7dba"
+BASELINE_CORRECT_MEAN = 49.94639239991636
+
+
+def test_legacy_generator_reproduces_baseline_frame():
+	generator = DataGenerator(seed=42, num_rows=150, vectorized=False)
+	df = generator.generate_corrupted_dataset()
+
+	assert df.shape == (180, 5)
+	assert list(df.columns) == [f"feature_{i}" for i in range(5)]
+	assert hashlib.sha256(df.to_numpy().tobytes()).hexdigest() == BASELINE_FRAME_SHA256
+	assert generator.correct_mean == BASELINE_CORRECT_MEAN
+
+
+def test_vectorized_generator_matches_legacy_layout():
+	legacy = DataGenerator(seed=42, num_rows=150, vectorized=False).generate_corrupted_dataset()
+	vectorized = DataGenerator(seed=42, num_rows=150, vectorized=True).generate_corrupted_dataset()
+
+	assert vectorized.shape == legacy.shape
+	assert list(vectorized.columns) == list(legacy.columns)
+	assert vectorized.isna().any(axis=1).sum() == legacy.isna().any(axis=1).sum()
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3, 42])
+def test_fused_processor_matches_data_processor(seed):
+	df = DataGenerator(seed=seed).generate_corrupted_dataset()
+	processor = DataProcessor(df)
+	expected = [
+		processor.calculate_mean_iqr_method(),
+		processor.calculate_mean_zscore_method(),
+		processor.calculate_mean_modified_zscore_method(),
+		processor.calculate_mean_percentile_method(),
+	]
+
+	assert FusedDataProcessor(df.to_numpy()).calculate_means() == pytest.approx(expected, rel=1e-12)
+
+
+def test_fused_means_are_computed_per_seed_in_a_batch():
+	frames = [DataGenerator(seed=seed).generate_corrupted_dataset().to_numpy() for seed in range(5)]
+	batched = fused_robust_means(np.stack(frames))
+
+	for frame, means in zip(frames, batched):
+		assert list(means) == pytest.approx(FusedDataProcessor(frame).calculate_means(), rel=1e-12)
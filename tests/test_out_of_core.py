@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from src.environment import FusedDataProcessor
+from src.out_of_core import ChunkedDataGenerator, StreamingDataProcessor, read_chunks, select_order_statistics
+
+
+def chunked(data, chunk_rows):
+	return lambda: (data[start:start + chunk_rows] for start in range(0, len(data), chunk_rows))
+
+
+@pytest.mark.parametrize("bins, gather_limit", [(16, 0), (16, 64), (1024, 4096)])
+def test_select_order_statistics_is_exact(bins, gather_limit):
+	rng = np.random.default_rng(0)
+	data = rng.standard_normal((2000, 5)) * 100
+	data[::7] = np.round(data[::7])
+	data[::11] *= -1e6
+	data[5, :] = 0.0
+	data[6, :] = -0.0
+	ranks = [0, 1, 499, 999, 1000, 1500, 1998, 1999]
+
+	results = select_order_statistics(chunked(data, 300), ranks, bins=bins, gather_limit=gather_limit)
+
+	assert np.array_equal(results, np.sort(data, axis=0)[ranks].T)
+
+
+def test_streaming_processor_matches_in_memory_processor(tmp_path):
+	path = str(tmp_path / "dataset.npy")
+	ChunkedDataGenerator(seed=7, num_rows=3000, chunk_rows=1000).write_shuffled_dataset(path)
+	data = np.concatenate(list(read_chunks(path, 1000, valid_only=False)))
+
+	streamed = StreamingDataProcessor(path, chunk_rows=700).calculate_means()
+
+	assert streamed == pytest.approx(FusedDataProcessor(data).calculate_means(), rel=1e-9)
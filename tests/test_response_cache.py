@@ -0,0 +1,15 @@
+from src.response_cache import ResponseCache, canonical_request_hash
+
+REQUEST = {"model": "claude", "max_tokens": 100, "tools": [], "messages": [{"role": "user", "content": "prompt"}]}
+
+
+def test_nested_scopes_keep_the_outer_scope():
+	cache = ResponseCache("record", "unused")
+	assert cache.scoped(1).scope == "1"
+	assert cache.scoped("cell-a").scoped(1).scope == "cell-a/1"
+
+
+def test_cells_with_the_same_run_id_get_distinct_keys():
+	cache = ResponseCache("record", "unused")
+	keys = {canonical_request_hash(REQUEST, cache.scoped(cell).scoped(1).scope) for cell in ("cell-a", "cell-b")}
+	assert len(keys) == 2
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from anthropic import APIConnectionError, APITimeoutError, BadRequestError, InternalServerError, RateLimitError
+
+from src.scheduler import RequestScheduler, TokenBucket
+
+
+REQUEST = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+
+
+def status_error(error_type, status_code):
+	response = httpx.Response(status_code, headers={"retry-after": "0"}, request=REQUEST)
+	return error_type("request failed", response=response, body=None)
+
+
+def rate_limit_error():
+	return status_error(RateLimitError, 429)
+
+
+def scripted_call(outcomes):
+	async def call():
+		outcome = outcomes.pop(0)
+		if isinstance(outcome, Exception):
+			raise outcome
+		return outcome
+	return call
+
+
+def quick_scheduler():
+	return RequestScheduler(max_retries=3, backoff_base=0.0, backoff_max=0.0)
+
+
+def test_token_bucket_adjust_refunds_up_to_capacity():
+	bucket = TokenBucket(600)
+	asyncio.run(bucket.acquire(500))
+	assert bucket.tokens == pytest.approx(100, abs=1)
+
+	bucket.adjust(300)
+	assert bucket.tokens == pytest.approx(400, abs=1)
+
+	bucket.adjust(1000)
+	assert bucket.tokens == 600
+
+
+def test_throttled_requests_refund_their_reservations():
+	scheduler = RequestScheduler(
+		requests_per_minute=600,
+		input_tokens_per_minute=6000,
+		output_tokens_per_minute=6000,
+		max_retries=3,
+		backoff_base=0.0,
+	)
+	usage = SimpleNamespace(input_tokens=10, output_tokens=100)
+	call = scripted_call([rate_limit_error(), rate_limit_error(), SimpleNamespace(usage=usage)])
+
+	response = asyncio.run(scheduler.submit({"max_tokens": 2000, "messages": []}, call))
+
+	assert response.usage is usage
+	assert scheduler.throttled_count == 2
+	# Without refunds the two throttled attempts would have left 6000 - 3 * 2000 output tokens
+	assert scheduler.output_token_bucket.tokens == pytest.approx(6000 - 100, abs=5)
+	assert scheduler.input_token_bucket.tokens == pytest.approx(6000 - 10, abs=5)
+
+
+@pytest.mark.parametrize("error", [
+	status_error(InternalServerError, 500),
+	status_error(InternalServerError, 503),
+	APIConnectionError(request=REQUEST),
+	APITimeoutError(request=REQUEST),
+])
+def test_server_and_connection_errors_are_retried(error):
+	scheduler = quick_scheduler()
+	response = SimpleNamespace(usage=SimpleNamespace(input_tokens=1, output_tokens=1))
+
+	assert asyncio.run(scheduler.submit({"max_tokens": 10, "messages": []}, scripted_call([error, response]))) is response
+	assert scheduler.failed_count == 1
+	assert scheduler.throttled_count == 0
+	assert scheduler.paused_until == 0.0
+
+
+def test_client_errors_are_not_retried():
+	scheduler = quick_scheduler()
+	call = scripted_call([status_error(BadRequestError, 400)])
+
+	with pytest.raises(BadRequestError):
+		asyncio.run(scheduler.submit({"max_tokens": 10, "messages": []}, call))
+	assert scheduler.failed_count == 0
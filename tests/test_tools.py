@@ -0,0 +1,110 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.environment import Environment
+from src.tools import BoundedOutputSink, SandboxSession, execute_expression, is_output_limit_error
+
+ROW = "0  12.345678  -3.141593  27.182818  1.414214  0.577216"
+
+
+@pytest.fixture(scope="module")
+def environment(tmp_path_factory):
+	path = str(tmp_path_factory.mktemp("environment") / "seed-42")
+	Environment.generate(seed=42, num_rows=150, vectorized=False).save(path)
+	return Environment.load(path)
+
+
+def run(environment, expression, accounting):
+	namespace = {"pd": pd, "np": np, "df": environment.df.copy()}
+	return execute_expression(namespace, expression, len(environment.df.columns), environment.dataset, accounting, profiling=False)
+
+
+def test_sink_counts_a_trailing_line_without_newline_on_finish():
+	sink = BoundedOutputSink(5, interrupt=False)
+	sink.write(ROW + "\n")
+	sink.write(ROW)
+	assert sink.value_count == 5
+
+	sink.finish()
+	assert sink.value_count == 10
+	assert sink.getvalue() == ROW + "\n" + ROW
+
+
+def test_sink_counts_a_line_written_in_pieces():
+	sink = BoundedOutputSink(5, interrupt=False)
+	for piece in ROW.split(" "):
+		sink.write(piece)
+		sink.write(" ")
+	assert sink.value_count == 0
+
+	sink.write("\n" + ROW + "\n")
+	assert sink.value_count == 10
+	assert sink.getvalue() == ROW + " \n" + ROW + "\n"
+
+
+def test_sink_finish_is_idempotent():
+	sink = BoundedOutputSink(5, interrupt=False)
+	sink.write(ROW)
+	sink.finish()
+	sink.finish()
+	assert sink.value_count == 5
+
+
+@pytest.mark.parametrize("accounting", ["regex", "source"])
+def test_frame_printed_without_trailing_newline_is_rejected(environment, accounting):
+	result = run(environment, "print(df.head(3).to_string(), end='')", accounting)
+	assert is_output_limit_error(result)
+
+
+@pytest.mark.parametrize("accounting", ["regex", "source"])
+@pytest.mark.parametrize("expression", [
+	"print(np.arange(11))",
+	"print(df.describe())",
+	"print(df.mean())",
+	"print(df.shape, len(df))",
+])
+def test_summaries_are_allowed(environment, accounting, expression):
+	result = run(environment, expression, accounting)
+	assert result["error"] is None
+
+
+@pytest.mark.parametrize("expression", [
+	"print(np.linspace(0, 1, 50))",
+	"print(np.random.default_rng(0).standard_normal((6, 5)))",
+	"print(df.head(2))",
+])
+def test_source_accounting_allows_values_not_taken_from_the_dataset(environment, expression):
+	result = run(environment, expression, "source")
+	assert result["error"] is None
+
+
+@pytest.mark.parametrize("expression", [
+	"print(df.values.tolist())",
+	"print(df.to_json())",
+	"print(df.to_dict())",
+	"print(list(df['feature_0']))",
+	"print(', '.join(str(value) for value in df['feature_1'].head(40)))",
+	"print(df.round(2).head(5))",
+	"print('shape'); print(df.head(15))",
+	"print(df.head(15).to_string(index=False))",
+])
+def test_source_accounting_rejects_dataset_values_in_any_format(environment, expression):
+	result = run(environment, expression, "source")
+	assert is_output_limit_error(result)
+
+
+def test_inline_session_edits_a_private_copy_of_the_shared_frame(environment):
+	source = environment.df.to_numpy().copy()
+	session = SandboxSession(environment.dataset)
+	expression = "df.iloc[0, 0] = 1e9\ndf.dropna(inplace=True)\ndf['feature_1'] *= 2\nprint(df.iloc[0, 0], len(df))"
+
+	result = asyncio.run(session.execute(expression))
+
+	assert result["error"] is None
+	assert result["result"].startswith("1000000000.0")
+	assert np.array_equal(environment.df.to_numpy(), source, equal_nan=True)
+	assert not pd.get_option("mode.copy_on_write")
+	assert asyncio.run(SandboxSession(environment.dataset).execute("print(len(df))"))["result"] == f"{len(source)}\n"